@@ -1,5 +1,8 @@
 import argparse
+import os
+import tempfile
 import memory
+from state import State
 from clients.main import main
 
 parser = argparse.ArgumentParser(description='Simple client based on state-space graph search.')
@@ -12,10 +15,44 @@ parser.add_argument('-g', '--subgoals', action='store', default=False, const="de
 parser.add_argument('-d', '--debug', action='store_true',
                     help="If the flag is not present, the exceptions will be caught by the client, if it"
                          "is present, they will be shown in the terminal.")
+parser.add_argument('--no_shuffle', action='store_true',
+                    help="Expand the children of a state in a fixed order.")
+parser.add_argument('--dead_pruning', action='store_true',
+                    help="Do not move boxes to cells from which they reach no goal.")
+parser.add_argument('--freeze_deadlocks', action='store_true',
+                    help="Do not move boxes into frozen clusters off their goals.")
+parser.add_argument('--tunnel_macros', action='store_true',
+                    help="Push or pull boxes through corridors in one step.")
+parser.add_argument('--goal_macros', action='store_true',
+                    help="Also push every box to its closest free goal in one step.")
+parser.add_argument('--walk_macros', action='store_true',
+                    help="Replace the moves by walks to the boxes.")
+parser.add_argument('--push_search', action='store_true',
+                    help="Search over pushes and pulls only.")
+parser.add_argument('--frontier', type=str, default='heap', choices=['heap', 'bucket'],
+                    help="The frontier of the best-first strategies (default heap).")
+parser.add_argument('--portfolio', metavar='<N>', type=int, default=0,
+                    help="Run the first N portfolio strategies in parallel (default 0: disabled).")
+parser.add_argument('--heuristic', type=str, default='reward', choices=['reward', 'matching'],
+                    help="The heuristic of the single agent levels (default reward).")
+parser.add_argument('--workers', metavar='<N>', type=int, default=None,
+                    help="Number of processes of hdastar (default one per CPU).")
+parser.add_argument('--lazy_distances', action='store_true',
+                    help="Compute the distances to a cell when first needed.")
+parser.add_argument('--distance_cache', metavar='<DIR>', type=str,
+                    default=os.path.join(tempfile.gettempdir(), 'searchclient_distances'),
+                    help="Directory of the cached distances of each layout.")
+parser.add_argument('--no_distance_cache', dest='distance_cache', action='store_const', const=None,
+                    help="Do not use the distance cache.")
 args = parser.parse_args()
+if args.push_search and args.strategy == 'hdastar':
+    parser.error('--push_search is not supported by hdastar.')
 
 # Set max memory usage allowed (soft limit).
 memory.max_usage = args.max_memory
+State.SHUFFLE = not args.no_shuffle
+State.PRUNE_DEAD = args.dead_pruning
+State.DETECT_FREEZE = args.freeze_deadlocks
 
 # Run client.
 main(**vars(args))
@@ -58,7 +58,7 @@ class StatespaceSearchAgent(Agent):
                 print(strategy.search_status(), file=sys.stderr, flush=True)
                 iterations = 0
 
-            if memory.get_usage() > memory.max_usage:
+            if memory.get_usage() > memory.max_usage and not strategy.on_memory_exceeded():
                 print('Maximum memory usage exceeded.', file=sys.stderr, flush=True)
                 self.solution = []
                 return None
@@ -96,7 +96,6 @@ class StatespaceSearchAgent(Agent):
         start_state = self.solution[start_time]
         noop_states = [State(start_state) for _ in range(0, units)]
         def fix_copies(prev, new):
-            new.t = prev
             new.action = Action(action_type = ActionType.NoOp,agent_dir=None, box_dir=None)
         reduce(fix_copies,noop_states,start_state)
         if len(self.solution) > start_time + 1:
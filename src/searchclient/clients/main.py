@@ -1,12 +1,17 @@
 
 from .searchclient import *
+import multiprocessing
+from queue import Empty
+from action import ALL_ACTIONS
 from agent import StatespaceSearchAgent
+from pushstate import PushState
 from conflictmanager import ConflictManager
 
-from preprocessing.mapper import WallMap, GoalMap, goals_sets
+from preprocessing.mapper import WallMap, GoalMap, goals_sets, corridor_squares
 from preprocessing.planner import Planner
 from strategy import factory as strategy_factory
 from heuristic.h_funct import *
+from heuristic.matching import h_matching
 
 
 def is_multi_agent(level):
@@ -20,7 +25,94 @@ def is_multi_agent(level):
     return is_m, line
 
 
-def main(strategy, subgoals, debug, **extras):
+# Strategy configurations run by the portfolio, in order of preference
+PORTFOLIO = [
+    dict(name='astar', subgoals='spc'),
+    dict(name='greedy', subgoals=False),
+    dict(name='wastar', subgoals=False, weight_value=5),
+    dict(name='astar', subgoals=False),
+    dict(name='greedy', subgoals='spc'),
+    dict(name='wastar', subgoals=False, weight_value=2),
+    dict(name='wastar', subgoals='default', weight_value=5),
+    dict(name='bfs', subgoals=False),
+]
+
+_ACTIONS = {repr(action): action for action in ALL_ACTIONS}
+
+# Heuristic functions of the single agent levels, by name
+HEURISTICS = {
+    'reward': h_constant_reward,
+    'matching': h_matching,
+}
+
+
+def _portfolio_worker(index, client, configuration, strategy_kwargs, results):
+    kwargs = dict(strategy_kwargs)
+    kwargs.update(configuration)
+    try:
+        strategy_ = strategy_factory(**kwargs)
+        solution = client.search(strategy_)
+        actions = None if solution is None else [repr(state.action) for state in solution]
+        results.put((index, actions, str(strategy_), strategy_.search_status()))
+    except Exception as ex:
+        results.put((index, None, str(configuration), repr(ex)))
+
+
+def _replay(initial_state, actions):
+    """ States of the plan given by the names of its actions, or None if it is not a valid solution. """
+    plan = []
+    state = initial_state
+    for name in actions:
+        state = state.get_child(_ACTIONS[name])
+        if state is None:
+            return None
+        plan.append(state)
+    return plan if state.is_subgoal_state() else None
+
+
+def portfolio_search(client, configurations, strategy_kwargs):
+    """
+    Runs client.search with every strategy configuration in its own forked process. The first valid plan found
+    is returned, together with the description and the status of its strategy, and the other workers are
+    terminated. Plans are sent back as action names and replayed from the initial state of the client.
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=_portfolio_worker,
+                               args=(index, client, configuration, strategy_kwargs, results),
+                               daemon=True)
+               for index, configuration in enumerate(configurations)]
+    for worker in workers:
+        worker.start()
+    pending = len(workers)
+    try:
+        while pending:
+            try:
+                index, actions, description, status = results.get(timeout=1)
+            except Empty:
+                # A worker that died without an answer would be waited for forever
+                if not any(worker.is_alive() for worker in workers) and results.empty():
+                    break
+                continue
+            pending -= 1
+            if actions is None:
+                print('Portfolio: {} found no solution ({}).'.format(description, status), file=sys.stderr, flush=True)
+                continue
+            solution = _replay(client.initial_state, actions)
+            if solution is not None:
+                return solution, description, status
+            print('Portfolio: {} returned an invalid plan.'.format(description), file=sys.stderr, flush=True)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+    return None, 'Portfolio of {} strategies'.format(len(workers)), 'No strategy found a solution'
+
+
+def main(strategy, subgoals, debug, push_search=False, frontier='heap', portfolio=0, workers=None,
+         lazy_distances=False, distance_cache=None, heuristic='reward', tunnel_macros=False,
+         goal_macros=False, walk_macros=False, **extras):
     # Read server messages from stdin.
     server_messages = sys.stdin
 
@@ -34,34 +126,49 @@ def main(strategy, subgoals, debug, **extras):
 
         initial_state = client.initial_state
         w_map = WallMap(initial_state.walls)
-        w_map.trim_map(initial_state.boxes, (initial_state.agent_row, initial_state.agent_col))
+        boxes = initial_state.boxes.copy()
+        w_map.trim_map(boxes, (initial_state.agent_row, initial_state.agent_col))
+        initial_state.boxes = boxes
+        State.WALK_MACROS = walk_macros
+        if tunnel_macros:
+            initial_state.level = initial_state.level.derive(corridors=corridor_squares(w_map))
+        if push_search:
+            initial_state = PushState(initial_state)
+            client.initial_state = initial_state
         #print(w_map.str_nodes(), file=sys.stderr, flush=True)
         #print(w_map.str_map(), file=sys.stderr, flush=True)
         g_map = GoalMap(initial_state.goals)
-        planner = Planner()
-        planner.floyd_warshall(initial_state.walls)
-        strategy_ = strategy_factory(name=strategy,
-                                     subgoals=subgoals,
-                                     wall_map=w_map,
-                                     goal_map=g_map,
-                                     initial_state=initial_state,
-                                     priority_function=goals_sets,
-                                     planner=planner,
-                                     heuristic_function=h_constant_reward,
-                                     dist_function=planner.dist,
-                                     weight_value=5)
-
-        solution = client.search(strategy_)
+        planner = Planner(lazy=lazy_distances, cache_dir=distance_cache)
+        planner.all_pairs(initial_state.walls, w_map)
+        planner.warm_up(list(initial_state.goals) + list(initial_state.boxes))
+        if goal_macros and not push_search:
+            initial_state.level = initial_state.level.derive(planner=planner)
+        strategy_kwargs = dict(wall_map=w_map,
+                               goal_map=g_map,
+                               initial_state=initial_state,
+                               priority_function=goals_sets,
+                               planner=planner,
+                               heuristic_function=HEURISTICS[heuristic],
+                               dist_function=planner.dist,
+                               weight_value=5,
+                               frontier=frontier,
+                               workers=workers)
+        if portfolio:
+            solution, description, status = portfolio_search(client, PORTFOLIO[:portfolio], strategy_kwargs)
+        else:
+            strategy_ = strategy_factory(name=strategy, subgoals=subgoals, **strategy_kwargs)
+            solution = client.search(strategy_)
+            description, status = strategy_, strategy_.search_status()
 
         # Read level and create the initial state of the problem.
         if solution is None:
-            print(strategy_.search_status(), file=sys.stderr, flush=True)
+            print(status, file=sys.stderr, flush=True)
             print('Unable to solve level.', file=sys.stderr, flush=True)
             sys.exit(0)
         else:
-            print('\nSummary for {}.'.format(strategy_), file=sys.stderr, flush=True)
+            print('\nSummary for {}.'.format(description), file=sys.stderr, flush=True)
             print('Found solution of length {}.'.format(len(solution)), file=sys.stderr, flush=True)
-            print('{}.'.format(strategy_.search_status()), file=sys.stderr, flush=True)
+            print('{}.'.format(status), file=sys.stderr, flush=True)
 
             for state in solution:
                 print("[" + str(state.action) + "]", flush=True)
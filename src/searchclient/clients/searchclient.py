@@ -12,6 +12,7 @@ import memory
 from strategy import Strategy
 
 from state import State
+from level import LevelContext
 from collections import defaultdict
 
 from multiagentstate import MultiAgentState
@@ -36,14 +37,13 @@ class SearchClient:
 
             tempwalls = []
             # [[False for _ in range(init_col)] for _ in range(init_row)]
-            initial_state.boxes = defaultdict(lambda: None)
+            tempboxes = defaultdict(lambda: None)
             # [[None for _ in range(init_col)] for _ in range(init_row)]
-            initial_state.goals = defaultdict(lambda: None)
+            goals = defaultdict(lambda: None)
             # [[None for _ in range(init_col)] for _ in range(init_row)]
 
             temp_agent_row = None
             temp_agent_col = None
-            goals_list = []
 
             row = 0
             while line:
@@ -59,20 +59,19 @@ class SearchClient:
                         temp_agent_row = row
                         temp_agent_col = col
                     elif char in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
-                        initial_state.boxes[(row, col)] = char
+                        tempboxes[(row, col)] = char
                     elif char in "abcdefghijklmnopqrstuvwxyz":
-                        initial_state.goals[(row, col)] = char
-                        goals_list.append((row, col))
+                        goals[(row, col)] = char
                 row += 1
                 line = server_messages.readline().rstrip()
 
             nrows = row
-            initial_state.MAX_ROW, initial_state.MAX_COL = nrows, ncols
-            initial_state.goals_list = goals_list
             initial_state.agent_row, initial_state.agent_col = temp_agent_row, temp_agent_col
-            initial_state.walls = [[False for _ in range(ncols)] for _ in range(nrows)]
+            walls = [[False for _ in range(ncols)] for _ in range(nrows)]
             for (i, j) in tempwalls:
-                initial_state.walls[i][j] = True
+                walls[i][j] = True
+            initial_state.level = LevelContext(walls, goals)
+            initial_state.boxes = tempboxes
 
             self.initial_state = initial_state
 
@@ -84,36 +83,40 @@ class SearchClient:
 
     def search(self, strategy_: 'Strategy') -> '[State, ...]':
         print('Starting search with strategy {}.'.format(strategy_), file=sys.stderr, flush=True)
-        strategy_.add_to_frontier(self.initial_state)
+        try:
+            strategy_.add_to_frontier(self.initial_state)
 
-        iterations = 0
-        while True:
-            if iterations == 1000:
-                print(strategy_.search_status(), file=sys.stderr, flush=True)
-                iterations = 0
+            iterations = 0
+            while True:
+                if iterations == 1000:
+                    print(strategy_.search_status(), file=sys.stderr, flush=True)
+                    iterations = 0
 
-            if memory.get_usage() > memory.max_usage:
-                print('Maximum memory usage exceeded.', file=sys.stderr, flush=True)
-                return None
+                if memory.get_usage() > memory.max_usage and not strategy_.on_memory_exceeded():
+                    print('Maximum memory usage exceeded.', file=sys.stderr, flush=True)
+                    return None
 
-            if strategy_.frontier_empty():
-                return None
+                if strategy_.frontier_empty():
+                    return None
 
-            leaf = strategy_.get_and_remove_leaf()
+                leaf = strategy_.get_and_remove_leaf()
 
-            if self.debug:
-                print(leaf, file=sys.stderr, flush=True)
+                if self.debug:
+                    print(leaf, file=sys.stderr, flush=True)
 
-            if strategy_.is_goal_state(leaf):
-                return leaf.extract_plan()
+                if strategy_.is_goal_state(leaf):
+                    return leaf.extract_plan()
 
-            strategy_.add_to_explored(leaf)
+                strategy_.add_to_explored(leaf)
 
-            for child_state in leaf.get_children():
-                if not strategy_.is_explored(child_state) and not strategy_.in_frontier(child_state):
-                    strategy_.add_to_frontier(child_state)
+                for child_state in leaf.get_children():
+                    if not strategy_.is_explored(child_state) and not strategy_.in_frontier(child_state):
+                        strategy_.add_to_frontier(child_state)
 
-            iterations += 1
+                iterations += 1
+        finally:
+            # A strategy that gives up still gives back what it changed, e.g. the cells blocked in the planner
+            strategy_.release()
 
 
 class MultiAgentSearchClient:
@@ -130,9 +133,8 @@ class MultiAgentSearchClient:
             ncols = 0
             initial_state = State()
             tempwalls = []
-            initial_state.boxes = defaultdict(lambda: None)
-            initial_state.goals = defaultdict(lambda: None)
-            goals_list = []
+            tempboxes = defaultdict(lambda: None)
+            goals = defaultdict(lambda: None)
             # Read lines for colors.
             line = first_line
             colors = defaultdict(lambda: None)
@@ -168,18 +170,17 @@ class MultiAgentSearchClient:
                         agents[char]['agent_row'] = row
                         agents[char]['agent_col'] = col
                     elif char in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
-                        initial_state.boxes[(row, col)] = char
+                        tempboxes[(row, col)] = char
                     elif char in "abcdefghijklmnopqrstuvwxyz":
-                        initial_state.goals[(row, col)] = char
-                        goals_list.append((row, col))
+                        goals[(row, col)] = char
                 row += 1
                 line = server_messages.readline().rstrip()
             nrows = row
-            initial_state.MAX_ROW, initial_state.MAX_COL = nrows, ncols
-            initial_state.goals_list = goals_list
-            initial_state.walls = [[False for _ in range(ncols)] for _ in range(nrows)]
+            walls = [[False for _ in range(ncols)] for _ in range(nrows)]
             for (i, j) in tempwalls:
-                initial_state.walls[i][j] = True
+                walls[i][j] = True
+            initial_state.level = LevelContext(walls, goals)
+            initial_state.boxes = tempboxes
             self.agents_map = agents
             self.colors = colors
             self.global_state = MultiAgentState(copy=initial_state,agents_map=agents,colors=colors)
@@ -157,25 +157,25 @@ class ConflictManager:
             agent1 = conflict.agent1
             agent2 = conflict.agent2
             agent1InitialState = agent1.initial_state
-            #note: copy_walls such that we don't destroy previous walls
-            agent2InitialState = State(agent2.initial_state,copy_walls=True)
+            #note: derive a new level such that we don't destroy previous walls
+            agent2InitialState = State(agent2.initial_state)
+            walls = [row[:] for row in agent2InitialState.walls]
+            goals = {}
             boxpos = conflict.objectPos
             _object = conflict._object
             #boxchar =  conflict.agent2.initial_state.boxes.get(boxpos)
-            agent2InitialState.goals = {}
             agent2InitialState.boxes = {} if _object is 'agent' else {boxpos: _object}
-            agent2InitialState.goals_list = []
             agent1_path = [(state.agent_row, state.agent_col) for state in agent1.solution]
             for row in range(0,agent2InitialState.MAX_ROW):
                 for col in range(0,agent2InitialState.MAX_COL):
-                    if not agent2InitialState.walls[row][col] and \
+                    if not walls[row][col] and \
                             not agent1InitialState.boxes.get((row, col)) and \
                             (row,col) not in agent1_path:
-                                agent2InitialState.goals[(row, col)] = _object.lower()
-                                agent2InitialState.goals_list.append((row, col))
+                                goals[(row, col)] = _object.lower()
                     else:
                             if ConflictManager.get_occupied(conflict.agent1,row,col,0): #TODO: this controls where agent1 is standing still
-                                agent2InitialState.walls[row][col] = True 
+                                walls[row][col] = True 
+            agent2InitialState.level = agent2InitialState.level.derive(walls=walls, goals=goals)
             #TODO: this could improved for now we inserts noops until agent2 has moved completly, also.
             agent2.search(agent2InitialState,goal_test_str='dl_conflict_solved')
             if len(agent2.solution) is not 0:
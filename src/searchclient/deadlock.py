@@ -0,0 +1,68 @@
+"""
+    Detection of the boxes that can never move again.
+"""
+from collections import OrderedDict
+from typing import Dict
+
+
+class FreezeDetector:
+    """
+        Freeze deadlocks: clusters of boxes that can never move again with a box off the goals of its letter.
+        The results are kept in a LRU table of at most max_entries clusters.
+    """
+
+    def __init__(self, level: 'LevelContext', max_entries: 'int' = 65536):
+        self.level = level
+        self.max_entries = max_entries
+        self.table = OrderedDict()
+        rows, cols = level.MAX_ROW, level.MAX_COL
+        walls = level.walls
+        # Free neighbour cells of every cell id
+        self.neighbours = [tuple((row + d_row) * cols + col + d_col
+                                 for d_row, d_col in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                                 if 0 <= row + d_row < rows and 0 <= col + d_col < cols
+                                 and not walls[row + d_row][col + d_col])
+                           for row, col in level.positions]
+
+    def deadlocked(self, state: 'State', cell: 'int', required: 'Dict[str, bytearray]') -> 'bool':
+        """
+        Whether the cluster of boxes of state around the box in cell is frozen with a box of one of the required
+        letters out of its goals.
+        """
+        neighbours = self.neighbours
+        occupied = dict(zip(state._box_cells, state._box_letters))
+        cluster = [cell]
+        seen = {cell}
+        for box in cluster:
+            for other in neighbours[box]:
+                if other in occupied and other not in seen:
+                    seen.add(other)
+                    cluster.append(other)
+        key = tuple(sorted((box, occupied[box]) for box in cluster))
+        result = self.table.get(key)
+        if result is not None:
+            self.table.move_to_end(key)
+            return result
+
+        frozen = set(cluster)
+        changed = True
+        while changed:
+            changed = False
+            for box in list(frozen):
+                if any(to not in frozen and (any(side not in frozen for side in neighbours[box] if side != to) or
+                                             any(side not in frozen for side in neighbours[to] if side != box))
+                       for to in neighbours[box]):
+                    frozen.remove(box)
+                    changed = True
+
+        goal_letters = self.level.goal_letters
+        result = False
+        for box in frozen:
+            letter = occupied[box]
+            if letter in required and (goal_letters[box] is None or goal_letters[box] not in letter.lower()):
+                result = True
+                break
+        self.table[key] = result
+        if len(self.table) > self.max_entries:
+            self.table.popitem(last=False)
+        return result
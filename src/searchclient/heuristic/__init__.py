@@ -6,6 +6,7 @@
 """
 
 from .h_funct import *
+from .matching import *
 from .heuristic import *
 
 
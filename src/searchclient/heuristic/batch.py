@@ -0,0 +1,211 @@
+"""
+    Batched evaluation of the box-goal assignment of the heuristic functions over the distances of a Planner.
+"""
+import numpy as np
+from typing import List, Tuple
+
+# Cost of the incompatible and already chosen boxes, above any distance
+_EXCLUDED = np.iinfo(np.int64).max
+
+
+class BatchAssignment:
+    """
+        Array version of _choose_box_for_goal and of the agent distance of _components in h_funct, over the
+        distances of a Planner. The values are the ones of the loops, ties included.
+    """
+    # Below this number of boxes the fixed cost of the array operations exceeds the one of the loops
+    MIN_BOXES = 8
+
+    def __init__(self, planner: 'Planner', goals_list: 'List[Tuple[int, int]]', max_col: 'int'):
+        self.planner = planner
+        self.goals_list = goals_list
+        self.goal_cells = np.array([row * max_col + col for row, col in goals_list], dtype=np.int64)
+        self._level = None
+        self._letters = None
+        self._compatible = None
+        self._on_goal_codes = None
+        # State whose children are evaluated, and its components
+        self._parent = None
+        self._parent_components = None
+
+    def _masks(self, state: 'State', box_letters: 'Tuple[str, ...]'):
+        """
+        Compatibility of every goal with every box, and for every cell the code of its goal letter compared to the
+        one of the box that would stand on it.
+        """
+        level = state.level
+        if level is self._level and (box_letters is self._letters or box_letters == self._letters):
+            return
+        goals = state.goals
+        letters = [letter.lower() for letter in box_letters]
+        self._compatible = np.array([[goals[goal] in letter for letter in letters] for goal in self.goals_list],
+                                    dtype=bool).reshape(len(self.goals_list), len(letters))
+        codes = {}
+        goal_codes = np.array([-1 if goal is None else codes.setdefault(goal, len(codes))
+                               for goal in level.goal_letters], dtype=np.int64)
+        box_codes = np.array([codes.get(letter, -2) for letter in letters], dtype=np.int64)
+        self._on_goal_codes = goal_codes, box_codes
+        self._level = level
+        self._letters = box_letters
+
+    def components(self, state: 'State', norm: 'str' = '',
+                   cache: 'BoxCache' = None) -> 'Tuple[List[Tuple[int, Tuple[int, int]]], int, int]':
+        """
+        (dist_goals, dist_between_boxes, min_dist_agent) of the heuristic functions for the given state. The
+        assignment is derived from the one of the parent, and with a cache it is also kept by configuration of
+        the boxes.
+        """
+        agent_cell, box_cells, box_letters = state.key()
+        self._masks(state, box_letters)
+        limit = state.MAX_ROW * state.MAX_COL
+        components = None if cache is None else cache.get(state)
+        if components is None or components[0] is not self:
+            if not norm:
+                components = self._derive(state, box_cells, box_letters, limit, cache)
+            if components is None:
+                components = self._entry(box_cells, self._assign(box_cells, limit, norm))
+            if cache is not None:
+                cache.put(state, components)
+        _, _, _, _, goal_dist, dist_between_boxes, agent_boxes = components
+
+        dist_agent = self.planner.dist_matrix(agent_boxes, np.array([agent_cell], dtype=np.int64))[0]
+        dist_agent = dist_agent[dist_agent > 0]
+        min_dist_agent = min(limit, int(dist_agent.min())) if len(dist_agent) else limit
+
+        return list(zip(goal_dist.tolist(), self.goals_list)), dist_between_boxes, min_dist_agent
+
+    def _entry(self, box_cells: 'Tuple[int, ...]', assignment: 'Tuple[np.ndarray, np.ndarray, np.ndarray, int]'):
+        """
+        Components of a state: (engine, box cells, cells, best, goal_dist, dist_between_boxes, agent_boxes), where
+        agent_boxes are the cells of the chosen boxes that are not on a goal of their letter.
+        """
+        cells, best = assignment[:2]
+        taken = np.zeros(len(cells), dtype=bool)
+        taken[best] = True
+        goal_codes, box_codes = self._on_goal_codes
+        return (self, box_cells) + assignment + (cells[taken & (goal_codes[cells] != box_codes)],)
+
+    def _assign(self, box_cells: 'Tuple[int, ...]', limit: 'int',
+                norm: 'str') -> 'Tuple[np.ndarray, np.ndarray, np.ndarray, int]':
+        """ (cells, best, goal_dist, dist_between_boxes) of the greedy assignment of the boxes to the goals. """
+        cells = np.array(box_cells, dtype=np.int64)
+        count = len(self.goals_list)
+        dist = self.planner.dist_matrix(cells, self.goal_cells)
+        cost = np.where(self._compatible, dist, _EXCLUDED)
+        best, goal_dist = self._choose(cost, np.zeros(len(cells), dtype=bool), limit)
+
+        if norm == 'bb' and count > 1:
+            chosen_cells = cells[best]
+            dist_between_boxes = int(self.planner.dist_matrix(chosen_cells[1:], chosen_cells[:-1]).trace())
+        elif norm == 'bg' and count > 1:
+            dist_between_boxes = int(dist[np.arange(count - 1), best[1:]].sum())
+        else:
+            dist_between_boxes = 0
+        return cells, best, goal_dist, dist_between_boxes
+
+    def _parent_entry(self, parent: 'State', limit: 'int', cache: 'BoxCache' = None) -> 'Tuple':
+        """
+        Components of the state whose children are evaluated. Only the ones of the last parent are kept, since the
+        children of a state are evaluated one after the other, so the states of the frontier hold none.
+        """
+        if parent is not self._parent:
+            components = None if cache is None else cache.get(parent)
+            if components is None or components[0] is not self:
+                parent_cells = parent.key()[1]
+                components = self._entry(parent_cells, self._assign(parent_cells, limit, ''))
+                if cache is not None:
+                    cache.put(parent, components)
+            self._parent = parent
+            self._parent_components = components
+        return self._parent_components
+
+    def _derive(self, state: 'State', box_cells: 'Tuple[int, ...]', box_letters: 'Tuple[str, ...]',
+                limit: 'int', cache: 'BoxCache' = None) -> 'Tuple':
+        """
+        Components of state derived from the ones of its parent, or None if it has none. When the boxes did
+        not move it is the same. When one box moved, only its column of distances is looked up, and the goals are
+        assigned again from the first one whose choice can change. The assignments where a goal got no box are
+        not derived, since they mark the last box as chosen and the last box depends on the order of the cells.
+        """
+        parent = state.parent
+        if parent is None or parent.level is not state.level or parent.key()[2] != box_letters:
+            return None
+        cached = self._parent_entry(parent, limit, cache)
+        _, parent_cells, cells, best, goal_dist, dist_between_boxes, _ = cached
+        if parent_cells is box_cells or parent_cells == box_cells:
+            return cached
+        if goal_dist.max(initial=0) >= limit:
+            return None
+        moved_from = set(parent_cells).difference(box_cells)
+        if len(moved_from) != 1:
+            return None
+        moved_to, = set(box_cells).difference(parent_cells)
+
+        # The cells are sorted within each letter, so the moved box and the ones it passed change index
+        before = parent_cells.index(moved_from.pop())
+        after = box_cells.index(moved_to)
+        index = np.arange(len(box_cells))
+        if after > before:
+            index[before + 1:after + 1] -= 1
+        elif after < before:
+            index[after:before] += 1
+        index[before] = after
+        cells = np.array(box_cells, dtype=np.int64)
+        chosen_by = np.flatnonzero(best == before)
+        best = index[best]
+        goal_dist = goal_dist.copy()
+
+        column = np.where(self._compatible[:, after],
+                          self.planner.dist_matrix(cells[after:after + 1], self.goal_cells)[:, 0], _EXCLUDED)
+        owner = int(chosen_by[0]) if len(chosen_by) else len(best)
+        # Goals before the owner of the box choose it if it became closer than their box, or as close and first
+        changed = np.flatnonzero((column[:owner] < goal_dist[:owner]) |
+                                 ((column[:owner] == goal_dist[:owner]) & (after < best[:owner])))
+        if len(changed):
+            start = int(changed[0])
+        elif owner < len(best) and column[owner] >= goal_dist[owner]:
+            start = owner
+        else:
+            # Only the owner sees the new distance, and the box is still its strictly closest one
+            if owner < len(best):
+                goal_dist[owner] = column[owner]
+            return self._entry(box_cells, (cells, best, goal_dist, dist_between_boxes))
+
+        taken = np.zeros(len(cells), dtype=bool)
+        taken[best[:start]] = True
+        cost = np.where(self._compatible[start:], self.planner.dist_matrix(cells, self.goal_cells[start:]), _EXCLUDED)
+        best[start:], goal_dist[start:] = self._choose(cost, taken, limit)
+        return self._entry(box_cells, (cells, best, goal_dist, dist_between_boxes))
+
+    @classmethod
+    def _choose(cls, cost: 'np.ndarray', taken: 'np.ndarray', limit: 'int') -> 'Tuple[np.ndarray, np.ndarray]':
+        """ Boxes chosen in turn by the goals of the rows of cost, and their distances, besides the taken ones. """
+        count = len(cost)
+        masked = np.where(taken, _EXCLUDED, cost)
+        best = masked.argmin(axis=1)
+        goal_dist = masked[np.arange(count), best]
+        chosen = taken.copy()
+        chosen[best] = True
+        if np.count_nonzero(chosen) - np.count_nonzero(taken) < count or goal_dist.max(initial=0) >= limit:
+            best, goal_dist = cls._sequential(masked, best.tolist(), goal_dist.tolist(), limit, taken.copy())
+        return best, goal_dist
+
+    @staticmethod
+    def _sequential(cost: 'np.ndarray', best: 'List[int]', goal_dist: 'List[int]', limit: 'int',
+                    taken: 'np.ndarray') -> 'Tuple[np.ndarray, np.ndarray]':
+        """
+        Goal by goal choice of _choose_box_for_goal: the first closest box that is not chosen yet, or the last box
+        if none is closer than limit. best and goal_dist are the choices over all the boxes, which only need to be
+        searched again when their box is already chosen.
+        """
+        for g_index, b_index in enumerate(best):
+            if taken[b_index]:
+                row = np.where(taken, _EXCLUDED, cost[g_index])
+                b_index = int(row.argmin())
+                goal_dist[g_index] = int(row[b_index])
+            if goal_dist[g_index] >= limit:
+                b_index = -1
+                goal_dist[g_index] = limit
+            best[g_index] = b_index
+            taken[b_index] = True
+        return np.array(best, dtype=np.int64), np.array(goal_dist, dtype=np.int64)
@@ -0,0 +1,53 @@
+"""
+    Cache of the parts of the heuristic estimates that only depend on the boxes of a state.
+"""
+import memory
+from collections import OrderedDict
+from math import isinf
+
+
+class BoxCache:
+    """
+        LRU cache of values keyed by (box cells, box letters), cleared when the level changes. Without
+        max_entries its size is ENTRY_SHARE of memory.max_usage, or DEFAULT_ENTRIES without a memory limit.
+    """
+    ENTRY_SHARE = 1 / 8
+    DEFAULT_ENTRIES = 1 << 16
+
+    def __init__(self, goals: 'int', max_entries: 'int' = None):
+        if max_entries is None:
+            max_entries = self.DEFAULT_ENTRIES
+            if not isinf(memory.max_usage):
+                # Dictionary slot, tuples of the goal distances and arrays of the assignment
+                entry_size = 256 + 96 * goals
+                max_entries = int(memory.max_usage * 1024 * 1024 * self.ENTRY_SHARE / entry_size)
+        self.max_entries = max(1, max_entries)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._level = None
+
+    def get(self, state: 'State'):
+        """ Value stored for the boxes of state, or None. """
+        if state.level is not self._level:
+            self.entries.clear()
+            self._level = state.level
+        _, box_cells, box_letters = state.key()
+        key = (box_cells, box_letters)
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, state: 'State', value):
+        _, box_cells, box_letters = state.key()
+        self.entries[(box_cells, box_letters)] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def status(self) -> 'str':
+        lookups = self.hits + self.misses
+        return '#HCacheHits: {} of {} ({:.1f}%)'.format(self.hits, lookups, 100 * self.hits / lookups if lookups else 0)
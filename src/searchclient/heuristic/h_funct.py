@@ -7,13 +7,7 @@ from common import goal_done
 
 
 def h_no_reward(self: 'Heuristic', state: 'State', dist_function) -> 'int':
-    boxes_list = [(pos, letter.lower()) for pos, letter in state.boxes.items()]
-    dist_agent = _box_agent_distances(self, state, boxes_list, dist_function)
-
-    dist_between_boxes, chosen, dist_goals = _choose_box_for_goal(self, state, boxes_list, dist_function)
-
-    # Now we compute the minimum distance from the agent to the closest box that was chosen to move to a goal
-    min_dist_agent = min_agent(self, state, chosen, dist_agent)
+    dist_goals, dist_between_boxes, min_dist_agent = _components(self, state, dist_function)
 
     # Sum of all distances computed (agent + dist_between_boxes + distance_goals_to_boxes)
     dist = sum([goal_dist[0] for goal_dist in dist_goals])
@@ -25,13 +19,7 @@ def h_no_reward(self: 'Heuristic', state: 'State', dist_function) -> 'int':
 
 
 def h_no_reward_no_bcluster(self: 'Heuristic', state: 'State', dist_function) -> 'int':
-    boxes_list = [(pos, letter.lower()) for pos, letter in state.boxes.items()]
-    dist_agent = _box_agent_distances(self, state, boxes_list, dist_function)
-
-    dist_between_boxes, chosen, dist_goals = _choose_box_for_goal(self, state, boxes_list, dist_function)
-
-    # Now we compute the minimum distance from the agent to the closest box that was chosen to move to a goal
-    min_dist_agent = min_agent(self, state, chosen, dist_agent)
+    dist_goals, dist_between_boxes, min_dist_agent = _components(self, state, dist_function)
 
     # Sum of all distances computed (agent + dist_between_boxes + distance_goals_to_boxes)
     dist = sum([goal_dist[0] for goal_dist in dist_goals])
@@ -44,14 +32,9 @@ def h_no_reward_no_bcluster(self: 'Heuristic', state: 'State', dist_function) ->
 
 def h_constant_reward(self: 'Heuristic', state: 'State', dist_function, norm='') -> 'int':
 
-    boxes_list = [(pos, letter.lower()) for pos, letter in state.boxes.items()]
-    dist_agent = _box_agent_distances(self, state, boxes_list, dist_function)
-
     scores = [self.score_reward for i in range(len(self.goals_list))]
 
-    dist_between_boxes, chosen, dist_goals = _choose_box_for_goal(self, state, boxes_list, dist_function, norm)
-
-    min_dist_agent = min_agent(self, state, chosen, dist_agent)
+    dist_goals, dist_between_boxes, min_dist_agent = _components(self, state, dist_function, norm)
 
     # Sum of all distances computed (agent + dist_between_boxes + distance_goals_to_boxes)
     dist = sum([goal_dist[0] for goal_dist in dist_goals])
@@ -65,14 +48,9 @@ def h_constant_reward(self: 'Heuristic', state: 'State', dist_function, norm='')
 
 def h_priority_reward(self: 'Heuristic', state: 'State', dist_function) -> 'int':
 
-    boxes_list = [(pos, letter.lower()) for pos, letter in state.boxes.items()]
-    dist_agent = _box_agent_distances(self, state, boxes_list, dist_function)
-
     # scores = [6 for i in range(len(self.goals_list))]
 
-    dist_between_boxes, chosen, dist_goals = _choose_box_for_goal(self, state, boxes_list, dist_function)
-
-    min_dist_agent = min_agent(self, state, chosen, dist_agent)
+    dist_goals, dist_between_boxes, min_dist_agent = _components(self, state, dist_function)
 
     # Sum of all distances computed (agent + dist_between_boxes + distance_goals_to_boxes)
     dist = sum([goal_dist[0] for goal_dist in dist_goals])
@@ -84,16 +62,38 @@ def h_priority_reward(self: 'Heuristic', state: 'State', dist_function) -> 'int'
         # we substract one becaue the agent is always going to be at least distance 1 to a box
 
 
-def _box_agent_distances(self, state, boxes_list, dist_function):
-    dist_agent = []
-    for pos, letter in boxes_list:
-        g = state.goals.get(pos)
-        if g is None or g != letter:
-            norm1a = dist_function(pos, (state.agent_row, state.agent_col))
-            dist_agent.append(norm1a)
-        else:
-            dist_agent.append(-1)
-    return dist_agent
+def _components(self, state, dist_function, norm='') -> ('[]', 'int', 'int'):
+    """
+    Distance of every goal to the box chosen for it, distance between the chosen boxes and distance from the agent
+    to the closest chosen box. Computed with array operations when the heuristic has a batch engine over the
+    distances of dist_function. The first two, and the chosen boxes, only depend on the boxes, so they are kept in
+    the cache of the heuristic when it has one.
+    """
+    batch = getattr(self, 'batch', None)
+    cache = getattr(self, 'cache', None)
+    if batch is not None and dist_function == batch.planner.dist and state.boxes:
+        return batch.components(state, norm, cache)
+
+    entry = None if cache is None else cache.get(state)
+    if entry is None:
+        boxes_list = [(pos, letter.lower()) for pos, letter in state.boxes.items()]
+        dist_between_boxes, chosen, dist_goals = _choose_box_for_goal(self, state, boxes_list, dist_function, norm)
+        # The agent only needs to reach the chosen boxes that are not on a goal of their letter yet
+        agent_boxes = [pos for k, (pos, letter) in enumerate(boxes_list)
+                       if chosen[k] and state.goals.get(pos) != letter]
+        entry = (dist_goals, dist_between_boxes, agent_boxes)
+        if cache is not None:
+            cache.put(state, entry)
+    dist_goals, dist_between_boxes, agent_boxes = entry
+
+    # Now we compute the minimum distance from the agent to the closest box that was chosen to move to a goal
+    agent = (state.agent_row, state.agent_col)
+    min_dist_agent = state.MAX_ROW * state.MAX_COL
+    for pos in agent_boxes:
+        dist_agent = dist_function(pos, agent)
+        if dist_agent > 0:
+            min_dist_agent = min(min_dist_agent, dist_agent)
+    return dist_goals, dist_between_boxes, min_dist_agent
 
 
 def _choose_box_for_goal(self, state, boxes_list, dist_function, norm='') -> ('int', '[]', '[]'):
@@ -128,15 +128,6 @@ def _choose_box_for_goal(self, state, boxes_list, dist_function, norm='') -> ('i
     return dist_between_boxes, chosen, dist_goals
 
 
-def min_agent(self, state, chosen, dist_agent) -> 'int':
-    # Now we compute the minimum distance from the agent to the closest box that was chosen to move to a goal
-    min_dist_agent = state.MAX_ROW * state.MAX_COL
-    for k in range(len(chosen)):
-        if chosen[k] and (dist_agent[k] > 0):
-            min_dist_agent = min(min_dist_agent, dist_agent[k])
-    return min_dist_agent
-
-
 def h_multiagent_generator(agent,agents):
     def h_multiagent(self:'Heuristic', state: 'State', dist_function=None) -> 'int':
         h_val = 0
@@ -5,25 +5,48 @@
 from common import manhattan_distance
 from abc import ABCMeta, abstractmethod
 from state import State
+from typing import Tuple
 from .h_funct import h_constant_reward as h
 from .setscore import set_score
+from .batch import BatchAssignment
+from .cache import BoxCache
 
 
 class Heuristic(metaclass=ABCMeta):
 
-    def __init__(self, initial_state: 'State', heuristic_function, dist_function=manhattan_distance, norm='', **kwargs):
+    def __init__(self, initial_state: 'State', heuristic_function, dist_function=manhattan_distance, norm='',
+                 h_cache_size: 'int' = None, **kwargs):
         self.initial_state = initial_state
         self.heuristic_function = heuristic_function
         self.goals_list = list(initial_state.goals.keys())
         self.score_reward = set_score(self, initial_state, dist_function)
         self.dist_function = dist_function
         self.norm = norm
+        # Array evaluation of the heuristic functions when the distances are the ones of the planner
+        planner = kwargs.get('planner')
+        self.planner = planner
+        # Minimum-cost matchings of h_matching, created on its first call
+        self.matching = None
+        self.batch = None
+        if planner is not None and dist_function == planner.dist \
+                and len(initial_state.boxes) >= BatchAssignment.MIN_BOXES:
+            self.batch = BatchAssignment(planner, self.goals_list, initial_state.MAX_COL)
+        # Parts of the estimates that only depend on the boxes, by configuration (h_cache_size=0 disables it)
+        self.cache = None if h_cache_size == 0 else BoxCache(len(self.goals_list), h_cache_size)
 
     def h(self, state: 'State') -> 'int':
         return self.heuristic_function(self, state, self.dist_function, self.norm)
 
+    def f(self, state: 'State') -> 'int':
+        return self.f_value(state.g, self.h(state))
+
+    def evaluate(self, state: 'State') -> 'Tuple[int, int]':
+        """ (f, h) of the state, computing h only once. """
+        h_ = self.h(state)
+        return self.f_value(state.g, h_), h_
+
     @abstractmethod
-    def f(self, state: 'State') -> 'int': pass
+    def f_value(self, g: 'int', h: 'int') -> 'int': pass
 
     @abstractmethod
     def __repr__(self): raise NotImplementedError
@@ -33,9 +56,8 @@ class AStar(Heuristic):
     def __init__(self, initial_state: 'State', heuristic_function, **kwargs):
         super().__init__(initial_state, heuristic_function, **kwargs)
 
-    def f(self, state: 'State') -> 'int':
-        h_ = self.h(state)
-        return state.g + h_
+    def f_value(self, g: 'int', h: 'int') -> 'int':
+        return g + h
 
     def __repr__(self):
         return 'A* evaluation'
@@ -46,8 +68,8 @@ class WAStar(Heuristic):
         super().__init__(initial_state, heuristic_function, **kwargs)
         self.w = w
 
-    def f(self, state: 'State') -> 'int':
-        return state.g + self.w * self.h(state)
+    def f_value(self, g: 'int', h: 'int') -> 'int':
+        return g + self.w * h
 
     def __repr__(self):
         return 'WA* ({}) evaluation'.format(self.w)
@@ -57,8 +79,8 @@ class Greedy(Heuristic):
     def __init__(self, initial_state: 'State', heuristic_function, **kwargs):
         super().__init__(initial_state, heuristic_function, **kwargs)
     
-    def f(self, state: 'State') -> 'int':
-        return self.h(state)
+    def f_value(self, g: 'int', h: 'int') -> 'int':
+        return h
     
     def __repr__(self):
         return 'Greedy evaluation'
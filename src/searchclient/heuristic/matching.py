@@ -0,0 +1,220 @@
+"""
+    Minimum-cost matching heuristic: every goal is matched to a different letter-compatible box so that the sum
+    of the box-goal distances is minimal (Hungarian algorithm), and the matchings are updated incrementally
+    when a single box moves.
+"""
+import numpy as np
+from collections import OrderedDict, namedtuple
+from scipy.optimize import linear_sum_assignment
+from typing import List, Tuple
+
+# Above any sum of distances and potentials
+_INF = np.iinfo(np.int64).max // 4
+
+# Optimal matching of the boxes of a configuration. The columns are the boxes, in the order of cells, and the rows
+# are the goals followed by dummy rows of cost 0, so that the problem is square. u and v are the potentials of the
+# rows and the columns: costs[i, j] - u[i] - v[j] >= 0, with equality on the matched pairs.
+Matching = namedtuple('Matching', ['cells', 'compatible', 'col4row', 'row4col', 'u', 'v', 'value'])
+
+
+class MatchingAssignment:
+    """
+        Minimum-cost matching between the goals and the boxes over the distances of a Planner, repaired by one
+        augmenting path when a child moves a single box. Kept by box configuration in a LRU of max_entries.
+    """
+
+    def __init__(self, planner: 'Planner', goals_list: 'List[Tuple[int, int]]', max_col: 'int',
+                 max_entries: 'int' = 16384):
+        self.planner = planner
+        self.goals_list = goals_list
+        self.goal_cells = np.array([row * max_col + col for row, col in goals_list], dtype=np.int64)
+        self.max_entries = max_entries
+        self.matchings = OrderedDict()
+        self.solved = 0
+        self.updated = 0
+        self._level = None
+
+    def value(self, state: 'State') -> 'int':
+        """ Sum of the distances of the minimum-cost matching of the goals to the boxes of state. """
+        _, box_cells, box_letters = state.key()
+        if state.level is not self._level:
+            # Other goals, so other costs
+            self.matchings.clear()
+            self._level = state.level
+        if len(self.goal_cells) == 0:
+            return 0
+        if len(box_cells) < len(self.goal_cells):
+            # Not every goal can get a box: no square problem, and nothing to update
+            cells = np.array(box_cells, dtype=np.int64)
+            costs = self._costs(cells, self._compatible(state, box_letters))
+            rows, cols = linear_sum_assignment(costs)
+            return int(costs[rows, cols].sum())
+
+        key = (box_cells, box_letters)
+        matching = self.matchings.get(key)
+        if matching is not None:
+            self.matchings.move_to_end(key)
+            return matching.value
+
+        parent = state.parent
+        base = None
+        if parent is not None and parent.level is state.level:
+            _, parent_cells, parent_letters = parent.key()
+            if parent_letters == box_letters:
+                moved_from = set(parent_cells).difference(box_cells)
+                if len(moved_from) == 1:
+                    base = self.matchings.get((parent_cells, parent_letters))
+        if base is not None:
+            moved_to, = set(box_cells).difference(parent_cells)
+            column, = np.flatnonzero(base.cells == moved_from.pop())
+            matching = self._update(base, int(column), moved_to)
+            self.updated += 1
+        else:
+            matching = self._solve(np.array(box_cells, dtype=np.int64), self._compatible(state, box_letters))
+            self.solved += 1
+
+        self.matchings[key] = matching
+        if len(self.matchings) > self.max_entries:
+            self.matchings.popitem(last=False)
+        return matching.value
+
+    def _compatible(self, state: 'State', box_letters: 'Tuple[str, ...]') -> 'np.ndarray':
+        goals = state.goals
+        letters = [letter.lower() for letter in box_letters]
+        return np.array([[goals[goal] in letter for letter in letters] for goal in self.goals_list],
+                        dtype=bool).reshape(len(self.goals_list), len(letters))
+
+    def _costs(self, cells: 'np.ndarray', compatible: 'np.ndarray') -> 'np.ndarray':
+        """ Distances of the goals to the boxes in the given cells, unreachable for the incompatible pairs. """
+        return np.where(compatible, self.planner.dist_matrix(cells, self.goal_cells), self.planner.UNREACHABLE)
+
+    def _solve(self, cells: 'np.ndarray', compatible: 'np.ndarray') -> 'Matching':
+        count = len(cells)
+        costs = np.zeros((count, count), dtype=np.int64)
+        costs[:len(compatible)] = self._costs(cells, compatible)
+        rows, col4row = linear_sum_assignment(costs)
+        row4col = np.empty(count, dtype=np.int64)
+        row4col[col4row] = rows
+        matched = costs[rows, col4row]
+
+        # Column potentials: shortest distances under the constraints v[j] - v[col4row[i]] <= costs[i, j] - matched[i],
+        # which have no negative cycle since the matching is optimal (Bellman-Ford, one relaxation of all rows per pass)
+        slack = costs - matched[:, None]
+        v = np.zeros(count, dtype=np.int64)
+        while True:
+            relaxed = np.minimum(v, (v[col4row][:, None] + slack).min(axis=0))
+            if np.array_equal(relaxed, v):
+                break
+            v = relaxed
+        u = matched - v[col4row]
+        return Matching(cells, compatible, col4row.astype(np.int64), row4col, u, v,
+                        int(matched[:len(compatible)].sum()))
+
+    def _update(self, base: 'Matching', column: 'int', cell: 'int') -> 'Matching':
+        """ Matching of base where the box of the given column moved to cell. """
+        cells = base.cells.copy()
+        cells[column] = cell
+        costs = self._costs(cells, base.compatible)
+        goals = len(costs)
+        col4row = base.col4row.copy()
+        row4col = base.row4col.copy()
+        u = base.u.copy()
+        v = base.v.copy()
+
+        # The column loses its row, and gets the highest potential that keeps its reduced costs non-negative
+        row = int(row4col[column])
+        row4col[column] = -1
+        col4row[row] = -1
+        v[column] = int((costs[:, column] - u[:goals]).min())
+        if goals < len(cells):
+            v[column] = min(v[column], int(-u[goals:].max()))
+        self._augment(costs, u, v, col4row, row4col, row)
+        value = int(costs[np.arange(goals), col4row[:goals]].sum())
+        return Matching(cells, base.compatible, col4row, row4col, u, v, value)
+
+    @staticmethod
+    def _augment(costs: 'np.ndarray', u: 'np.ndarray', v: 'np.ndarray', col4row: 'np.ndarray',
+                 row4col: 'np.ndarray', start: 'int'):
+        """
+        Matches the free row start along a shortest augmenting path of reduced costs, and updates the potentials
+        so that they stay feasible and tight on the matched pairs. The rows past the goals cost 0.
+        """
+        goals, count = costs.shape
+        dummy = np.zeros(count, dtype=np.int64)
+        shortest = np.full(count, _INF, dtype=np.int64)
+        path = np.full(count, -1, dtype=np.int64)
+        remaining = np.ones(count, dtype=bool)
+        free = row4col < 0
+        visited_rows = []
+        min_val = 0
+        row = start
+        while True:
+            visited_rows.append(row)
+            reduced = min_val + (costs[row] if row < goals else dummy) - u[row] - v
+            better = remaining & (reduced < shortest)
+            shortest[better] = reduced[better]
+            path[better] = row
+            candidates = np.where(remaining, shortest, _INF)
+            min_val = int(candidates.min())
+            ties = candidates == min_val
+            free_ties = ties & free
+            column = int(free_ties.argmax()) if free_ties.any() else int(ties.argmax())
+            remaining[column] = False
+            if free[column]:
+                break
+            row = int(row4col[column])
+
+        u[start] += min_val
+        others = np.array(visited_rows[1:], dtype=np.int64)
+        u[others] += min_val - shortest[col4row[others]]
+        scanned = ~remaining
+        v[scanned] -= min_val - shortest[scanned]
+        while True:
+            row = int(path[column])
+            row4col[column] = row
+            col4row[row], column = column, int(col4row[row])
+            if row == start:
+                break
+
+
+def h_matching(self: 'Heuristic', state: 'State', dist_function, norm='') -> 'int':
+    """
+    Admissible estimate: cost of the minimum-cost matching of the goals to the boxes, plus the moves of the agent
+    before it is next to a box. With the distances of a Planner the matchings are updated incrementally. The cost
+    of the matching only depends on the boxes, so it is kept in the cache of the heuristic when it has one.
+    """
+    planned = self.planner is not None and dist_function == self.planner.dist
+    cache = getattr(self, 'cache', None)
+    dist = None if cache is None else cache.get(state)
+    if dist is None:
+        if planned:
+            if self.matching is None:
+                self.matching = MatchingAssignment(self.planner, self.goals_list, self.initial_state.MAX_COL)
+            dist = self.matching.value(state)
+        else:
+            dist = _matching_value(self, state, dist_function)
+        if cache is not None:
+            cache.put(state, dist)
+    if dist == 0 or not state.boxes:
+        return dist
+
+    if planned:
+        agent_cell, box_cells, _ = state.key()
+        dist_agent = self.planner.dist_matrix(np.array(box_cells, dtype=np.int64),
+                                              np.array([agent_cell], dtype=np.int64))
+        return dist + max(0, int(dist_agent.min()) - 1)
+    agent = (state.agent_row, state.agent_col)
+    return dist + max(0, min(dist_function(pos, agent) for pos in state.boxes) - 1)
+
+
+def _matching_value(self: 'Heuristic', state: 'State', dist_function) -> 'int':
+    """ Cost of the minimum-cost matching of the goals to the boxes over dist_function. """
+    if not self.goals_list:
+        return 0
+    boxes_list = [(pos, letter.lower()) for pos, letter in state.boxes.items()]
+    unreachable = state.MAX_ROW * state.MAX_COL
+    costs = np.array([[dist_function(pos, goal) if state.goals[goal] in letter else unreachable
+                       for pos, letter in boxes_list]
+                      for goal in self.goals_list], dtype=np.int64).reshape(len(self.goals_list), len(boxes_list))
+    rows, cols = linear_sum_assignment(costs)
+    return int(costs[rows, cols].sum())
@@ -0,0 +1,175 @@
+"""
+    Level context shared by all the states of a search.
+"""
+from action import ALL_ACTIONS, Action, ActionType
+from typing import List, Dict, Tuple
+from zobrist import ZobristTable
+from deadlock import FreezeDetector
+
+
+class LevelContext:
+    """
+        Immutable description of a level: walls, dimensions, goals and the tables that are
+        precomputed from them. States only reference it, so it should never be modified in place;
+        use derive() to get a context with different walls or goals.
+    """
+
+    def __init__(self, walls: 'List[List[bool]]', goals: 'Dict[Tuple[int, int], str]',
+                 zobrist: 'ZobristTable' = None, positions: 'List[Tuple[int, int]]' = None,
+                 successors: 'List[Tuple[Tuple[Action, int, int, int], ...]]' = None,
+                 corridors: 'List[Tuple[int, int]]' = None, planner: 'Planner' = None):
+        self.walls = walls
+        self.goals = goals
+        self.MAX_ROW = len(walls)
+        self.MAX_COL = len(walls[0]) if walls else 0
+        if positions is None:
+            # (row, col) of every cell id row * MAX_COL + col
+            positions = [(row, col) for row in range(self.MAX_ROW) for col in range(self.MAX_COL)]
+        self.positions = positions
+        # Goal letter of every cell id, or None
+        self.goal_letters = [None] * (self.MAX_ROW * self.MAX_COL)
+        for (row, col), letter in goals.items():
+            if letter is not None:
+                self.goal_letters[row * self.MAX_COL + col] = letter
+        self.goal_count = len(self.goal_letters) - self.goal_letters.count(None)
+        if zobrist is None:
+            zobrist = ZobristTable(self.MAX_ROW, self.MAX_COL)
+        self.zobrist = zobrist
+        self._successors = successors
+        # Corridor squares where the boxes are moved through in one expansion, and their cell ids without goals
+        self.corridors = corridors
+        self.tunnels = None
+        if corridors is not None:
+            self.tunnels = bytearray(self.MAX_ROW * self.MAX_COL)
+            for row, col in corridors:
+                if self.goal_letters[row * self.MAX_COL + col] is None:
+                    self.tunnels[row * self.MAX_COL + col] = 1
+        # Distances of the walls along which the children push boxes to goals in one expansion, or None
+        self.planner = planner
+        # Dead cells of the boxes, by box letters
+        self._dead = {}
+        self._freeze = None
+
+    @property
+    def successors(self) -> 'List[Tuple[Tuple[Action, int, int, int], ...]]':
+        """
+        Successor table of the level, indexed by the cell id of the agent. Each entry lists the tuples
+        (action, agent_to, box_from, box_to) of the actions that the walls allow from that cell, in the
+        order of ALL_ACTIONS. The cells are ids, and box_from = box_to = -1 for the moves.
+        """
+        if self._successors is None:
+            self._successors = self._successor_table()
+        return self._successors
+
+    @property
+    def freeze(self) -> 'FreezeDetector':
+        """ Freeze deadlock detector of the level, created on first use. """
+        if self._freeze is None:
+            self._freeze = FreezeDetector(self)
+        return self._freeze
+
+    def _successor_table(self) -> 'List[Tuple[Tuple[Action, int, int, int], ...]]':
+        walls = self.walls
+        rows, cols = self.MAX_ROW, self.MAX_COL
+
+        def free(row: 'int', col: 'int') -> 'bool':
+            return 0 <= row < rows and 0 <= col < cols and not walls[row][col]
+
+        table = []
+        for row, col in self.positions:
+            successors = []
+            if not walls[row][col]:
+                for action in ALL_ACTIONS:
+                    agent_row = row + action.agent_dir.d_row
+                    agent_col = col + action.agent_dir.d_col
+                    if not free(agent_row, agent_col):
+                        continue
+                    agent_to = agent_row * cols + agent_col
+                    if action.action_type is ActionType.Move:
+                        successors.append((action, agent_to, -1, -1))
+                    elif action.action_type is ActionType.Push:
+                        box_row = agent_row + action.box_dir.d_row
+                        box_col = agent_col + action.box_dir.d_col
+                        if free(box_row, box_col):
+                            successors.append((action, agent_to, agent_to, box_row * cols + box_col))
+                    else:
+                        box_row = row + action.box_dir.d_row
+                        box_col = col + action.box_dir.d_col
+                        if free(box_row, box_col):
+                            successors.append((action, agent_to, box_row * cols + box_col, row * cols + col))
+            table.append(tuple(successors))
+        return table
+
+    def dead_cells(self, box_letters: 'Tuple[str, ...]') -> 'Dict[str, bytearray]':
+        """
+        For every letter of box_letters whose boxes must all end on a goal, the mask of the cells from which a box
+        of that letter reaches none of its goals.
+        """
+        dead = self._dead.get(box_letters)
+        if dead is None:
+            dead = {}
+            goal_cells = [cell for cell, goal in enumerate(self.goal_letters) if goal is not None]
+            letters = set(box_letters)
+            for letter in letters:
+                fits = [cell for cell in goal_cells if self.goal_letters[cell] in letter.lower()]
+                if not fits or box_letters.count(letter) > len(fits) or \
+                        any(self.goal_letters[cell] in other.lower() for cell in fits
+                            for other in letters if other != letter):
+                    continue
+                reached = self._box_reachable(fits)
+                dead[letter] = bytearray(not reached[cell] and not self.walls[row][col]
+                                         for cell, (row, col) in enumerate(self.positions))
+            self._dead[box_letters] = dead
+        return dead
+
+    def _box_reachable(self, targets: 'List[int]') -> 'bytearray':
+        """
+        Mask of the cells from which a box alone in the level reaches one of the target cells. A box moves to a
+        free neighbour cell when the agent can push it, from another free neighbour of the box, or pull it, to
+        another free neighbour of that cell; the search goes backwards from the targets.
+        """
+        rows, cols = self.MAX_ROW, self.MAX_COL
+        walls = self.walls
+        directions = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+        def free_neighbours(row: 'int', col: 'int') -> 'int':
+            return sum(0 <= row + d_row < rows and 0 <= col + d_col < cols and not walls[row + d_row][col + d_col]
+                       for d_row, d_col in directions)
+
+        reached = bytearray(rows * cols)
+        for cell in targets:
+            reached[cell] = 1
+        frontier = list(targets)
+        while frontier:
+            next_frontier = []
+            for cell in frontier:
+                row, col = self.positions[cell]
+                for d_row, d_col in directions:
+                    # The box comes from the neighbour (from_row, from_col), that is then free as well as cell
+                    from_row, from_col = row + d_row, col + d_col
+                    if not (0 <= from_row < rows and 0 <= from_col < cols) or walls[from_row][from_col] \
+                            or reached[from_row * cols + from_col]:
+                        continue
+                    if free_neighbours(from_row, from_col) > 1 or free_neighbours(row, col) > 1:
+                        reached[from_row * cols + from_col] = 1
+                        next_frontier.append(from_row * cols + from_col)
+            frontier = next_frontier
+        return reached
+
+    def derive(self, walls: 'List[List[bool]]' = None, goals: 'Dict[Tuple[int, int], str]' = None,
+               corridors: 'List[Tuple[int, int]]' = None, planner: 'Planner' = None) -> 'LevelContext':
+        """
+        New context with the given walls, goals, corridors and/or planner, sharing the rest with this one. The
+        corridors and the planner belong to the walls, so they are dropped with other walls.
+        """
+        successors = None
+        if walls is None:
+            walls = self.walls
+            successors = self._successors
+            if corridors is None:
+                corridors = self.corridors
+            if planner is None:
+                planner = self.planner
+        if goals is None:
+            goals = self.goals
+        return LevelContext(walls, goals, self.zobrist, self.positions, successors, corridors, planner)
@@ -11,6 +11,7 @@ import copy
 import memory
 from agent import StatespaceSearchAgent
 from state import State
+from level import LevelContext
 from conflictmanager import ConflictManager
 from collections import defaultdict
 from strategy import StrategyBFS, StrategyDFS, StrategyBestFirst
@@ -32,9 +33,8 @@ class MultiAgentSearchClient:
             ncols = 0
             initial_state = State()
             tempwalls = []
-            initial_state.boxes = defaultdict(lambda: None)
-            initial_state.goals =  defaultdict(lambda: None)
-            goals_list = []
+            tempboxes = defaultdict(lambda: None)
+            goals = defaultdict(lambda: None)
             # Read lines for colors.
             line = server_messages.readline().rstrip()
             colors = defaultdict(lambda: None)
@@ -70,18 +70,17 @@ class MultiAgentSearchClient:
                         agents[char]['agent_row'] = row
                         agents[char]['agent_col'] = col
                     elif char in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
-                        initial_state.boxes[(row, col)] = char
+                        tempboxes[(row, col)] = char
                     elif char in "abcdefghijklmnopqrstuvwxyz":
-                        initial_state.goals[(row, col)] = char
-                        goals_list.append((row, col))
+                        goals[(row, col)] = char
                 row += 1
                 line = server_messages.readline().rstrip()
             nrows = row
-            initial_state.MAX_ROW, initial_state.MAX_COL = nrows, ncols
-            initial_state.goals_list = goals_list
-            initial_state.walls = [[False for _ in range(ncols)] for _ in range(nrows)]
+            walls = [[False for _ in range(ncols)] for _ in range(nrows)]
             for (i, j) in tempwalls:
-                initial_state.walls[i][j] = True
+                walls[i][j] = True
+            initial_state.level = LevelContext(walls, goals)
+            initial_state.boxes = tempboxes
             self.agents_map = agents
             self.colors = colors
             self.global_state = MultiAgentState(copy=initial_state,agents_map=agents,colors=colors)
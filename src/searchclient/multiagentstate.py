@@ -5,8 +5,8 @@ import copy
 
 class MultiAgentState(State):
 
-    def __init__(self, copy: 'State' = None, size=None, copy_walls: 'bool' = False,agents_map = None,colors=None):
-        super().__init__(copy, size, copy_walls)
+    def __init__(self, copy: 'State' = None, level: 'LevelContext' = None, agents_map = None,colors=None):
+        super().__init__(copy, level)
         self.agents_map = agents_map
         self.colors = colors
 
@@ -32,28 +32,22 @@ class MultiAgentState(State):
 
     def split_state(self,copy_walls=False):
         agents = copy.deepcopy(self.agents_map)
-        for _, agent in agents.items():
-            state = State()
-            state.goals = defaultdict(lambda: None)
-            state.boxes = defaultdict(lambda: None)
-            state.agent_row = agent['agent_row']
-            state.agent_col = agent['agent_col']
-            state.goals_list = []
-            state.MAX_ROW = self.MAX_ROW
-            state.MAX_COL = self.MAX_COL
-
-            if copy_walls:
-                state.walls =  [row[:] for row in self.walls]
-            else:
-                state.walls = self.walls  # [row[:] for row in copy.walls]
-            agent['initial_state'] = state
+        agents_goals = defaultdict(lambda: defaultdict(lambda: None))
         for (row, col), char in self.goals.items():
             for agent_id in self.colors[char.upper()]:
-                agent = agents[agent_id]
-                agent['initial_state'].goals[(row, col)] = char
-                agent['initial_state'].goals_list.append((row, col))
-        for (row,col), char in self.boxes.items():
+                agents_goals[agent_id][(row, col)] = char
+        agents_boxes = defaultdict(dict)
+        for (row, col), char in self.boxes.items():
             for agent_id in self.colors[char.upper()]:
-                agent = agents[agent_id]
-                agent['initial_state'].boxes[(row, col)] = char
+                agents_boxes[agent_id][(row, col)] = char
+        for agent_id, agent in agents.items():
+            if copy_walls:
+                walls = [row[:] for row in self.walls]
+            else:
+                walls = self.walls  # [row[:] for row in copy.walls]
+            state = State(level=self.level.derive(walls=walls, goals=agents_goals[agent_id]))
+            state.boxes = agents_boxes[agent_id]
+            state.agent_row = agent['agent_row']
+            state.agent_col = agent['agent_col']
+            agent['initial_state'] = state
         return agents
@@ -374,6 +374,11 @@ def order_corridor_list(from_node: "Node", node: "Node"):
     return result_list
 
 
+def corridor_squares(wall_map: "WallMap") -> "List[Tuple[int, int]]":
+    """ Squares of the corridors of the wall map, where a box takes the whole width. """
+    return [square for node in wall_map.nodes.values() if node.type_ is NodeType.Corridor for square in node.squares]
+
+
 def goals_sets(wall_map: "WallMap", goal_map: "GoalMap", **extras):
 
     state = extras.get("state")
@@ -434,7 +439,7 @@ def goals_sets(wall_map: "WallMap", goal_map: "GoalMap", **extras):
                 for goal in xx:
                     node = wall_map.map[goal[0]][goal[1]]
                     if node.type_ == NodeType.Corridor:
-                        path = set(planner.path_cells(goal, asoc_dict[goal][0]))
+                        path = planner.path_set(goal, asoc_dict[goal][0])
                         for conn in node.connections:
                             junct_square = next(iter(conn.squares))
                             if junct_square in path:
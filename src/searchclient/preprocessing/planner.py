@@ -5,10 +5,14 @@ from .mapper import *
 from typing import List
 
 import numpy as np
-from scipy.sparse.csgraph import floyd_warshall
+from scipy.sparse import csr_matrix, diags
+from scipy.sparse.csgraph import shortest_path
 from queue import PriorityQueue
-from typing import Tuple
+from typing import Tuple, Set
 from copy import deepcopy
+from collections import OrderedDict
+import hashlib
+import os
 
 
 class Action:
@@ -80,80 +84,322 @@ class PriorityPlanner:
 
 
 class Planner:
-
-    def __init__(self):
+    """
+        Shortest distances between the free cells of a level, one BFS per cell. In lazy mode the rows are searched
+        when first needed and kept in a LRU of max_rows rows. With cache_dir the matrix is cached by layout.
+    """
+    # Distance between cells that are not connected
+    UNREACHABLE = np.iinfo(np.uint16).max
+    # Number of sources searched at once, which bounds the float64 rows scipy returns
+    CHUNK = 256
+
+    def __init__(self, lazy: 'bool' = False, max_rows: 'int' = 1024, cache_dir: 'str' = None):
         self.size = None
         self.nrows = None
         self.mat = None
-        self.predecessors = None
-
-    def floyd_warshall(self, walls):
-        if self.mat is None:
+        # Compact index of every cell id row * size + col, or -1 for the walls and the trimmed cells
+        self.index = None
+        self.cell_index = None
+        # Cell id of every compact index
+        self.cells = None
+        # (row, col) and compact indices of the neighbours of every compact index
+        self.positions = None
+        self.neighbours = None
+        self.graph = None
+        # Graph of all the indexed cells, and compact indices of the blocked ones
+        self.free_graph = None
+        self.blocked = set()
+        self.lazy = lazy
+        self.max_rows = max_rows
+        # Compact index of a source to its row of distances, least recently used first
+        self.rows = OrderedDict()
+        self.cache_dir = cache_dir
+
+    def all_pairs(self, walls, wall_map: 'WallMap' = None):
+        """
+        Distances between every pair of free cells. If wall_map is given, the cells that
+        WallMap.trim_map removed are not indexed. In lazy mode, only the index of the cells is built.
+        """
+        if self.graph is None:
             self.size = len(walls[0])
             self.nrows = len(walls)
-            fw_size = len(walls[0]) * len(walls)
-            matrix = np.full((fw_size, fw_size), fill_value=9999, dtype='int16')
-
-            matrix[0][0] = 0
-            for col in range(1, len(walls[0])):
-                if not walls[0][col]:
-                    matrix[self._matrix_index(0, col)][self._matrix_index(0, col)] = 0
-                    if not walls[0][col - 1]:
-                        matrix[self._matrix_index(0, col - 1)][self._matrix_index(0, col)] = 1
-                        matrix[self._matrix_index(0, col)][self._matrix_index(0, col - 1)] = 1
-
-            for row in range(1, len(walls)):
-                matrix[self._matrix_index(row, 0)][self._matrix_index(row, 0)] = 0
-                if not walls[row-1][0] and not walls[row][0]:
-                    matrix[self._matrix_index(row, 0)][self._matrix_index(row - 1, 0)] = 1
-                    matrix[self._matrix_index(row-1, 0)][self._matrix_index(row, 0)] = 1
-
-                for col in range(1, len(walls[0])):
-                    matrix[self._matrix_index(row, col)][self._matrix_index(row, col)] = 0
-                    if not walls[row][col]:
-                        if not walls[row - 1][col]:
-                            matrix[self._matrix_index(row, col)][self._matrix_index(row-1, col)] = 1
-                            matrix[self._matrix_index(row-1, col)][self._matrix_index(row, col)] = 1
-                        if not walls[row][col-1]:
-                            matrix[self._matrix_index(row, col-1)][self._matrix_index(row, col)] = 1
-                            matrix[self._matrix_index(row, col)][self._matrix_index(row, col-1)] = 1
-            mat, pred = floyd_warshall(matrix, False, True)
-            self.mat = mat.astype(int)
-            self.predecessors = pred
-        return self.mat, self.predecessors
+            self.cells = [row * self.size + col
+                          for row in range(self.nrows) for col in range(self.size)
+                          if not walls[row][col] and (wall_map is None or wall_map.map[row][col] is not None)]
+            self.index = [-1] * (self.nrows * self.size)
+            for i, cell in enumerate(self.cells):
+                self.index[cell] = i
+            self.cell_index = np.array(self.index, dtype=np.int64)
+            self.positions = [(cell // self.size, cell % self.size) for cell in self.cells]
+            self.graph = self.free_graph = self._graph()
+
+            if not self.lazy and not self._load():
+                count = len(self.cells)
+                dtype = self._dtype(count)
+                self.mat = np.empty((count, count), dtype=dtype)
+                for start in range(0, count, self.CHUNK):
+                    sources = range(start, min(start + self.CHUNK, count))
+                    self.mat[sources.start:sources.stop] = self._search(sources)
+                self._save()
+        return self.mat
+
+    # Kept for the callers of the former dense Floyd-Warshall
+    floyd_warshall = all_pairs
+
+    def _cache_path(self) -> 'str':
+        """ File of the distances of this layout in the cache directory. """
+        fingerprint = hashlib.sha1()
+        fingerprint.update(np.array([self.nrows, self.size], dtype=np.int64).tobytes())
+        fingerprint.update(np.array(self.cells, dtype=np.int64).tobytes())
+        fingerprint.update(np.dtype(self._dtype(len(self.cells))).str.encode())
+        return os.path.join(self.cache_dir, fingerprint.hexdigest() + '.dist.npy')
+
+    def _load(self) -> 'bool':
+        """
+        Memory-maps the matrix of this layout from the cache directory, if it is there. The map is copy-on-write,
+        so block and unblock only copy the pages they change and the file is never modified.
+        """
+        if self.cache_dir is None:
+            return False
+        try:
+            self.mat = np.load(self._cache_path(), mmap_mode='c')
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def _save(self):
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path()
+            # Written under a temporary name first, so that concurrent runs never load half a file
+            temp_path = '{}.{}.tmp.npy'.format(path[:-len('.npy')], os.getpid())
+            np.save(temp_path, self.mat)
+            os.replace(temp_path, path)
+        except OSError:
+            pass
+
+    def _graph(self) -> 'csr_matrix':
+        """ Adjacency matrix of the indexed cells, 4-connected. """
+        index = self.index
+        size = self.size
+        rows, cols = [], []
+        self.neighbours = []
+        for i, cell in enumerate(self.cells):
+            col = cell % size
+            neighbours = []
+            for neighbour, valid in ((cell - size, True), (cell + size, True),
+                                     (cell - 1, col > 0), (cell + 1, col < size - 1)):
+                if valid and 0 <= neighbour < len(index) and index[neighbour] >= 0:
+                    rows.append(i)
+                    cols.append(index[neighbour])
+                    neighbours.append(index[neighbour])
+            self.neighbours.append(tuple(neighbours))
+        count = len(self.cells)
+        return csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(count, count))
+
+    def _search(self, sources) -> 'np.ndarray':
+        """ Distances from the given compact indices, one row per source. """
+        dist = shortest_path(self.graph, method='D', unweighted=True, indices=sources)
+        dist[np.isinf(dist)] = self.UNREACHABLE
+        return dist.astype(self._dtype(len(self.cells)))
+
+    @classmethod
+    def _dtype(cls, count: 'int'):
+        return np.uint16 if count < cls.UNREACHABLE else np.uint32
+
+    def _row(self, source: 'int') -> 'np.ndarray':
+        """ Distances of the search from the compact index source. """
+        if self.mat is not None:
+            return self.mat[source]
+        row = self.rows.get(source)
+        if row is None:
+            row = self._search([source])[0]
+            self.rows[source] = row
+            if len(self.rows) > self.max_rows:
+                self.rows.popitem(last=False)
+        else:
+            self.rows.move_to_end(source)
+        return row
+
+    def warm_up(self, positions):
+        """ Searches at once the rows of the given cells, typically the goals and the boxes, in lazy mode. """
+        if self.mat is not None:
+            return
+        sources = [i for i in dict.fromkeys(self._matrix_index(*pos) for pos in positions)
+                   if i >= 0 and i not in self.rows][:self.max_rows]
+        for start in range(0, len(sources), self.CHUNK):
+            chunk = sources[start:start + self.CHUNK]
+            for source, row in zip(chunk, self._search(chunk)):
+                self.rows[source] = row
+        while len(self.rows) > self.max_rows:
+            self.rows.popitem(last=False)
+
+    def block(self, positions):
+        """
+        Turns the given cells into walls. The rows with a shortest path through one of them are searched
+        again, and the other rows only lose the blocked cells.
+        """
+        cells = [i for i in dict.fromkeys(self._matrix_index(*pos) for pos in positions)
+                 if i >= 0 and i not in self.blocked]
+        if not cells:
+            return
+        if self.mat is not None:
+            affected = np.zeros(len(self.cells), dtype=bool)
+            for start in range(0, len(self.cells), self.CHUNK):
+                chunk = self.mat[start:start + self.CHUNK]
+                for cell in cells:
+                    affected[start:start + self.CHUNK] |= self._crosses(chunk, self.mat[cell], cell)
+            sources = np.flatnonzero(affected)
+        else:
+            blocked_rows = [self._row(cell) for cell in cells]
+            sources = [source for source, row in self.rows.items()
+                       if any(self._crosses(row, blocked_row, cell)
+                              for cell, blocked_row in zip(cells, blocked_rows))]
+
+        self.blocked.update(cells)
+        self._update_graph()
+        if self.mat is not None:
+            self.mat[:, cells] = self.UNREACHABLE
+            self.mat[cells, :] = self.UNREACHABLE
+            self.mat[cells, cells] = 0
+            for start in range(0, len(sources), self.CHUNK):
+                chunk = sources[start:start + self.CHUNK]
+                self.mat[chunk] = self._search(chunk)
+        else:
+            # The affected rows are searched again the next time they are needed
+            for source in sources:
+                del self.rows[source]
+            for row in self.rows.values():
+                row[cells] = self.UNREACHABLE
+
+    def unblock(self, positions):
+        """
+        Frees the given cells again. The new shortest paths go through the freed cell, so every distance is
+        the minimum of the old one and the one through that cell, which needs no search.
+        """
+        cells = [i for i in dict.fromkeys(self._matrix_index(*pos) for pos in positions) if i in self.blocked]
+        if not cells:
+            return
+        for cell in cells:
+            # Distances from the freed cell through its free neighbours, before it is freed
+            through = np.full(len(self.cells), self.UNREACHABLE, dtype=np.int64)
+            for neighbour in self.neighbours[cell]:
+                if neighbour not in self.blocked:
+                    through = np.minimum(through, self._row(neighbour).astype(np.int64) + 1)
+            through[through > self.UNREACHABLE] = self.UNREACHABLE
+            through[list(self.blocked)] = self.UNREACHABLE
+            through[cell] = 0
+            self.blocked.discard(cell)
+            self._update_graph()
+
+            if self.mat is not None:
+                # In chunks of rows, to bound the temporary int64 matrix
+                for start in range(0, len(self.cells), self.CHUNK):
+                    chunk = self.mat[start:start + self.CHUNK]
+                    chunk[:] = np.minimum(chunk, np.minimum(through[start:start + self.CHUNK, None] + through,
+                                                            self.UNREACHABLE))
+                self.mat[cell] = through
+                self.mat[:, cell] = through
+            else:
+                for source, row in self.rows.items():
+                    row[:] = np.minimum(row, np.minimum(through[source] + through, self.UNREACHABLE))
+
+    def _crosses(self, rows: 'np.ndarray', blocked_row: 'np.ndarray', cell: 'int') -> 'np.ndarray':
+        """
+        Whether each of the rows of distances has a shortest path through the compact index cell, whose own
+        row of distances is blocked_row, to another cell.
+        """
+        rows = np.asarray(rows)
+        through = rows[..., cell, None].astype(np.int64) + blocked_row
+        crosses = (through == rows) & (rows[..., cell, None] != self.UNREACHABLE)
+        crosses[..., cell] = False
+        return crosses.any(axis=-1)
+
+    def _update_graph(self):
+        """ Graph of the indexed cells without the blocked ones. """
+        free = np.ones(len(self.cells), dtype=np.int8)
+        free[list(self.blocked)] = 0
+        mask = diags(free, dtype=np.int8)
+        self.graph = csr_matrix(mask @ self.free_graph @ mask)
 
     def _matrix_index(self, row, col):
-        return row * self.size + col
+        return self.index[row * self.size + col]
 
     def _label(self, index):
-        row, col = index // self.size, index % self.size
-        return row, col
+        return self.positions[index]
 
-    def path_cells(self, cfrom, cto):
-        pred = self.predecessors
+    def _walk(self, cfrom, cto) -> 'List[int]':
+        """
+        Compact indices of a shortest path from cfrom to cto, both included: every step goes to the first
+        neighbour one step closer to cto. Empty if cto cannot be reached.
+        """
         ifrom = self._matrix_index(*cfrom)
         ito = self._matrix_index(*cto)
-
-        path = [ito]
-        previous_cell = ito
-        while previous_cell != ifrom:
-            previous_cell = pred[ifrom][previous_cell]
-            path.append(previous_cell)
-        path = [self._label(ind) for ind in path]
-        path.reverse()
+        dist = self._row(ito)
+        neighbours = self.neighbours
+        remaining = dist.item(ifrom)
+        if remaining == self.UNREACHABLE:
+            return []
+
+        path = [ifrom]
+        cell = ifrom
+        while remaining:
+            remaining -= 1
+            for neighbour in neighbours[cell]:
+                if dist.item(neighbour) == remaining:
+                    cell = neighbour
+                    break
+            path.append(cell)
         return path
 
+    def path_cells(self, cfrom, cto):
+        positions = self.positions
+        return [positions[ind] for ind in self._walk(cfrom, cto)]
+
+    def path_set(self, cfrom, cto) -> 'Set[Tuple[int, int]]':
+        """ Cells of path_cells(cfrom, cto), for the callers that only test membership. """
+        positions = self.positions
+        return {positions[ind] for ind in self._walk(cfrom, cto)}
+
 # Given a goal, we need to look for the closest box, and then get cells we need to "liberate" to get it.
     def closest_cell(self, cfrom, cto_list):
         """cto_list is a list of possible cells, we need to find the closest one to cfrom"""
-        ifrom = self._matrix_index(*cfrom)
-        ito_list = [self._matrix_index(*cell) for cell in cto_list]
-        dists = [self.mat[ifrom][c] for c in ito_list]
-        ito = ito_list[dists.index(min(dists))]
-        return self._label(ito)
+        dists = [self.dist(cfrom, cell) for cell in cto_list]
+        return cto_list[dists.index(min(dists))]
 
     def dist(self, pos_a, pos_b):
-        return self.mat[self._matrix_index(*pos_a)][self._matrix_index(*pos_b)]
+        index = self.index
+        ia = index[pos_a[0] * self.size + pos_a[1]]
+        ib = index[pos_b[0] * self.size + pos_b[1]]
+        if ia < 0 or ib < 0:
+            return 0 if pos_a == pos_b else self.UNREACHABLE
+        if self.mat is not None:
+            return self.mat.item(ib, ia)
+        return self._row(ib).item(ia)
+
+    def dist_matrix(self, sources: 'np.ndarray', targets: 'np.ndarray') -> 'np.ndarray':
+        """
+        Distances dist(source, target) between two arrays of cell ids row * size + col, as an int64 matrix with
+        one row per target. Cells that are not indexed follow dist: 0 to themselves and unreachable otherwise.
+        """
+        isources = self.cell_index[sources]
+        itargets = self.cell_index[targets]
+        outside = isources.min(initial=0) < 0 or itargets.min(initial=0) < 0
+        if outside:
+            isources = np.maximum(isources, 0)
+            itargets = np.maximum(itargets, 0)
+        if self.mat is not None:
+            dist = self.mat[itargets[:, None], isources].astype(np.int64)
+        else:
+            dist = np.empty((len(itargets), len(isources)), dtype=np.int64)
+            for i, target in enumerate(itargets.tolist()):
+                dist[i] = self._row(target)[isources]
+        if outside:
+            outside = (self.cell_index[targets][:, None] < 0) | (self.cell_index[sources][None, :] < 0)
+            dist[outside] = np.where(targets[:, None] == sources[None, :], 0, self.UNREACHABLE)[outside]
+        return dist
 
     def boxes_goals_clustered(self, boxes_pos, goals_pos):
         """ Check is boxes are close to each other, goals close to each other."""
@@ -0,0 +1,107 @@
+from action import ActionType
+from state import State
+
+
+class PushState(State):
+    """
+        State of the push/pull-level search: the agent is normalized to the smallest cell of its region, and walk
+        holds the moves from the parent to the cell where the push or pull starts.
+    """
+    __slots__ = ('walk', '_region')
+
+    def __init__(self, copy: 'State' = None, level: 'LevelContext' = None):
+        super().__init__(copy, level)
+        self.walk = ()
+        self._region = None
+
+    def get_children(self) -> '[PushState, ...]':
+        """
+        Returns the states attained by every push and pull the agent can reach, walking included. The walk is
+        a shortest one in the free cells, and it is added to the g of the child.
+        """
+        hash(self)
+        level = self.level
+        zobrist = level.zobrist
+        cells = self._box_cells
+        boxes_hash = self._hash ^ zobrist.agent[self._region]
+        reached = self._reachable(self.agent_row * level.MAX_COL + self.agent_col)
+        required = level.dead_cells(self._box_letters) if State.PRUNE_DEAD or State.DETECT_FREEZE else None
+        dead = required if State.PRUNE_DEAD else None
+        freeze = level.freeze if State.DETECT_FREEZE and required else None
+
+        children = []
+        for cell in reached:
+            walk = None
+            for action, agent_to, box_from, box_to in level.successors[cell]:
+                action_type = action.action_type
+                if action_type is ActionType.Move:
+                    continue
+                elif action_type is ActionType.Push:
+                    if box_from not in cells or box_to in cells:
+                        continue
+                elif agent_to in cells or box_from not in cells:
+                    continue
+                if dead and self._is_dead(dead, box_from, box_to):
+                    continue
+                if walk is None:
+                    walk = self._walk(reached, cell)
+                child = PushState(self)
+                child.agent_row, child.agent_col = level.positions[agent_to]
+                child.parent = self
+                child.action = action
+                child.walk = walk
+                child.g = self.g + len(walk) + 1
+                letter = child._move_box(box_from, box_to)
+                if self._solved is not None:
+                    child._solved = self._move_solved(letter, box_from, box_to)
+                box_keys = zobrist.box(letter)
+                child._region = min(child._reachable(agent_to))
+                child._hash = boxes_hash ^ box_keys[box_from] ^ box_keys[box_to] ^ zobrist.agent[child._region]
+                if freeze is not None and child._is_frozen(freeze, required, box_to):
+                    continue
+                children.append(child)
+        if State.SHUFFLE:
+            State._RANDOM.shuffle(children)
+        return children
+
+    def extract_plan(self) -> '[State, ...]':
+        """
+        Plan of primitive states: the walk before each push or pull is expanded into moves, followed by the
+        state of the push or pull itself.
+        """
+        nodes = []
+        state = self
+        while not state.is_initial_state():
+            nodes.append(state)
+            state = state.parent
+        nodes.reverse()
+
+        plan = []
+        for node in nodes:
+            state = State(node.parent)
+            for action in node.walk:
+                state = state.get_child(action)
+                plan.append(state)
+            plan.append(node)
+        return plan
+
+    def reset_hash(self):
+        super().reset_hash()
+        self._region = None
+
+    def __hash__(self):
+        if self._hash is None:
+            # The agent is hashed by the normalized cell of its region.
+            self._region = min(self._reachable(self.agent_row * self.level.MAX_COL + self.agent_col))
+            self._hash = self.level.zobrist.hash(self._region, self._box_cells, self._box_letters)
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other: return True
+        if not isinstance(other, PushState): return False
+        if hash(self) != hash(other): return False
+        if self._region != other._region: return False
+        if self.level is not other.level: return False
+        if self._box_cells != other._box_cells: return False
+        if self._box_letters != other._box_letters: return False
+        return True
@@ -13,6 +13,7 @@ import memory
 from collections import defaultdict
 
 from state import State
+from level import LevelContext
 from strategy import Strategy, factory as strategy_factory
 from preprocessing.mapper import WallMap, GoalMap
 
@@ -39,14 +40,13 @@ class SearchClient:
 
             tempwalls = []
             # [[False for _ in range(init_col)] for _ in range(init_row)]
-            initial_state.boxes = defaultdict(lambda: None)
+            tempboxes = defaultdict(lambda: None)
             # [[None for _ in range(init_col)] for _ in range(init_row)]
-            initial_state.goals = defaultdict(lambda: None)
+            goals = defaultdict(lambda: None)
             # [[None for _ in range(init_col)] for _ in range(init_row)]
 
             temp_agent_row = None
             temp_agent_col = None
-            goals_list = []
 
             row = 0
             while line:
@@ -62,20 +62,19 @@ class SearchClient:
                         temp_agent_row = row
                         temp_agent_col = col
                     elif char in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
-                        initial_state.boxes[(row, col)] = char
+                        tempboxes[(row, col)] = char
                     elif char in "abcdefghijklmnopqrstuvwxyz":
-                        initial_state.goals[(row, col)] = char
-                        goals_list.append((row, col))
+                        goals[(row, col)] = char
                 row += 1
                 line = server_messages.readline().rstrip()
 
             nrows = row
-            initial_state.MAX_ROW, initial_state.MAX_COL = nrows, ncols
-            initial_state.goals_list = goals_list
             initial_state.agent_row, initial_state.agent_col = temp_agent_row, temp_agent_col
-            initial_state.walls = [[False for _ in range(ncols)] for _ in range(nrows)]
+            walls = [[False for _ in range(ncols)] for _ in range(nrows)]
             for (i, j) in tempwalls:
-                initial_state.walls[i][j] = True
+                walls[i][j] = True
+            initial_state.level = LevelContext(walls, goals)
+            initial_state.boxes = tempboxes
 
             self.initial_state = initial_state
             # self.initial_state = State(size=(nrows, ncols))
@@ -103,7 +102,7 @@ class SearchClient:
                 print(strategy_.search_status(), file=sys.stderr, flush=True)
                 iterations = 0
 
-            if memory.get_usage() > memory.max_usage:
+            if memory.get_usage() > memory.max_usage and not strategy_.on_memory_exceeded():
                 print('Maximum memory usage exceeded.', file=sys.stderr, flush=True)
                 return None
 
@@ -135,7 +134,7 @@ class SearchClient:
                 print(strategy_.search_status(), file=sys.stderr, flush=True)
                 iterations = 0
 
-            if memory.get_usage() > memory.max_usage:
+            if memory.get_usage() > memory.max_usage and not strategy_.on_memory_exceeded():
                 print('Maximum memory usage exceeded.', file=sys.stderr, flush=True)
                 return None
 
@@ -173,7 +172,9 @@ def main(strategy_name, subgoal_separ, debug):
 
     initial_state = client.initial_state
     w_map = WallMap(initial_state.walls)
-    w_map.trim_map(initial_state.boxes, (initial_state.agent_row, initial_state.agent_col))
+    boxes = initial_state.boxes.copy()
+    w_map.trim_map(boxes, (initial_state.agent_row, initial_state.agent_col))
+    initial_state.boxes = boxes
     g_map = GoalMap(initial_state.goals)
     strategy_ = strategy_factory(name=strategy_name,
                                  subgoals=subgoal_separ,
@@ -6,18 +6,35 @@
 
 import random
 # import sys
-from action import ALL_ACTIONS, ActionType
-from typing import Tuple
+from action import ActionType
+from bisect import bisect_left, bisect_right
+from collections.abc import MutableMapping
+from typing import Tuple, List, Dict
+from level import LevelContext
 
 
 class State:
+    __slots__ = ('level', 'agent_row', 'agent_col', '_box_cells', '_box_letters', 'parent', 'action', 'macro', 'g',
+                 '_hash', '_solved')
     _RANDOM = random.Random(2)
+    # Shuffle the children of a state, disable for a deterministic and cheaper expansion
+    SHUFFLE = True
+    # Do not generate the children that move a box to a dead cell of its letter (see LevelContext.dead_cells)
+    PRUNE_DEAD = False
+    # Number of children not generated because of a dead cell
+    dead_pruned = 0
+    # Do not generate the children where the moved box is part of a frozen cluster (see FreezeDetector)
+    DETECT_FREEZE = False
+    # Number of children not generated because of a freeze deadlock
+    freeze_pruned = 0
+    # Replace the moves of the agent by walks to the cells where it can push or pull a box (see _walk_macros)
+    WALK_MACROS = False
     # MAX_ROW = 70
     # MAX_COL = 70
 
-    def __init__(self, copy: 'State' = None, size=None, copy_walls: 'bool' = False):
+    def __init__(self, copy: 'State' = None, level: 'LevelContext' = None):
         '''
-        If copy is None: Creates an empty State.
+        If copy is None: Creates an empty State of the given level.
         If copy is not None: Creates a copy of the copy state.
 
         The lists walls, boxes, and goals are indexed from top-left of the level, row-major order (row, col).
@@ -30,110 +47,413 @@ class State:
         For example, self.walls is a list of size [MAX_ROW][MAX_COL] and
         self.walls[2][7] is True if there is a wall at row 3, column 8 in this state.
 
+        The walls and goals belong to the shared LevelContext. The boxes are the sorted tuples _box_letters and
+        _box_cells (row * MAX_COL + col, sorted within each letter); self.boxes is a dict-like view of them.
+        macro holds the actions of a macro child before action.
+
         Note: The state should be considered immutable after it has been hashed, e.g. added to a dictionary!
         '''
         self._hash = None
 
         if copy is None:
-            if size is not None:
-                self.MAX_ROW, self.MAX_COL = size
-            else:
-                self.MAX_ROW, self.MAX_COL = 70, 70
+            self.level = level
 
             self.agent_row = None
             self.agent_col = None
 
-            self.walls = None  # [[False for _ in range(self.MAX_COL)] for _ in range(self.MAX_ROW)]
-            self.boxes = None  # [[None for _ in range(self.MAX_COL)] for _ in range(self.MAX_ROW)]
-            self.goals = None  # [[None for _ in range(self.MAX_COL)] for _ in range(self.MAX_ROW)]
-            # self.goals_list = None
+            self._box_cells = ()
+            self._box_letters = ()
 
             self.parent = None
             self.action = None
+            self.macro = ()
 
             self.g = 0
+            self._solved = None
         else:
+            self.level = copy.level
             self.agent_row = copy.agent_row
             self.agent_col = copy.agent_col
-            self.MAX_ROW, self.MAX_COL = copy.MAX_ROW, copy.MAX_COL
-            if copy_walls:
-                self.walls = [row[:] for row in copy.walls]
-            else:
-                self.walls = copy.walls  # [row[:] for row in copy.walls]
-            self.boxes = copy.boxes.copy()
-            self.goals = copy.goals  # [row[:] for row in copy.goals]
-            # self.goals_list = copy.goals_list
+            self._box_cells = copy._box_cells
+            self._box_letters = copy._box_letters
 
             self.parent = copy.parent
             self.action = copy.action
+            self.macro = copy.macro
 
             self.g = copy.g
+            self._solved = copy._solved
+
+    @property
+    def boxes(self) -> 'BoxView':
+        return BoxView(self)
+
+    @boxes.setter
+    def boxes(self, boxes: 'Dict[Tuple[int, int], str]'):
+        cols = self.level.MAX_COL
+        items = sorted((letter, row * cols + col) for (row, col), letter in boxes.items() if letter is not None)
+        self._box_letters = tuple(letter for letter, _ in items)
+        self._box_cells = tuple(cell for _, cell in items)
+        self._hash = None
+        self._solved = None
+
+    @property
+    def walls(self) -> 'List[List[bool]]':
+        return self.level.walls
+
+    @walls.setter
+    def walls(self, walls: 'List[List[bool]]'):
+        self.level = self.level.derive(walls=walls)
+        self._solved = None
+
+    @property
+    def goals(self) -> 'Dict[Tuple[int, int], str]':
+        return self.level.goals
+
+    @goals.setter
+    def goals(self, goals: 'Dict[Tuple[int, int], str]'):
+        self.level = self.level.derive(goals=goals)
+        self._solved = None
+
+    @property
+    def solved_goals(self) -> 'int':
+        """ Number of goals with a matching box. Children update it incrementally once it is known. """
+        if self._solved is None:
+            goal_letters = self.level.goal_letters
+            solved = 0
+            for cell, letter in zip(self._box_cells, self._box_letters):
+                goal = goal_letters[cell]
+                if goal is not None and goal in letter.lower():
+                    solved += 1
+            self._solved = solved
+        return self._solved
+
+    @property
+    def total_goals(self) -> 'int':
+        return self.level.goal_count
+
+    @property
+    def MAX_ROW(self) -> 'int':
+        return self.level.MAX_ROW
+
+    @property
+    def MAX_COL(self) -> 'int':
+        return self.level.MAX_COL
 
     def get_child(self, action):
         # Determine if action is applicable.
         child = None
         if action.action_type is ActionType.NoOp:
             child = State(self)
-            child.agent_row = self.agent_row
-            child.agent_col = self.agent_col
             child.parent = self
             child.action = action
             child.g += 1
+            child._hash = self._hash
         else:
+            cols = self.level.MAX_COL
             new_agent_row = self.agent_row + action.agent_dir.d_row
             new_agent_col = self.agent_col + action.agent_dir.d_col
             if action.action_type is ActionType.Move:
                 if self.is_free(new_agent_row, new_agent_col):
-                    child = State(self)
-                    child.agent_row = new_agent_row
-                    child.agent_col = new_agent_col
-                    child.parent = self
-                    child.action = action
-                    child.g += 1
+                    child = self._child(action, new_agent_row * cols + new_agent_col)
             elif action.action_type is ActionType.Push:
                 if self.box_at(new_agent_row, new_agent_col):
                     new_box_row = new_agent_row + action.box_dir.d_row
                     new_box_col = new_agent_col + action.box_dir.d_col
                     if self.is_free(new_box_row, new_box_col):
-                        child = State(self)
-                        child.agent_row = new_agent_row
-                        child.agent_col = new_agent_col
-                        child.boxes[(new_box_row, new_box_col)] = child.boxes.pop((new_agent_row, new_agent_col))
-                        # child.boxes[new_box_row][new_box_col] = self.boxes[new_agent_row][new_agent_col]
-                        # child.boxes[new_agent_row][new_agent_col] = None
-                        child.parent = self
-                        child.action = action
-                        child.g += 1
+                        child = self._child(action, new_agent_row * cols + new_agent_col,
+                                            new_agent_row * cols + new_agent_col, new_box_row * cols + new_box_col)
 
             elif action.action_type is ActionType.Pull:
                 if self.is_free(new_agent_row, new_agent_col):
                     box_row = self.agent_row + action.box_dir.d_row
                     box_col = self.agent_col + action.box_dir.d_col
                     if self.box_at(box_row, box_col):
-                        child = State(self)
-                        child.agent_row = new_agent_row
-                        child.agent_col = new_agent_col
-                        child.boxes[(self.agent_row, self.agent_col)] = child.boxes.pop((box_row, box_col))
-                        # child.boxes[self.agent_row][self.agent_col] = self.boxes[box_row][box_col]
-                        # child.boxes[box_row][box_col] = None
-                        child.parent = self
-                        child.action = action
-                        child.g += 1
+                        child = self._child(action, new_agent_row * cols + new_agent_col,
+                                            box_row * cols + box_col, self.agent_row * cols + self.agent_col)
+        return child
+
+    def _child(self, action, agent_to: 'int', box_from: 'int' = -1, box_to: 'int' = -1) -> 'State':
+        """
+        Child reached by an applicable action that moves the agent to the cell agent_to and, for pushes and
+        pulls, the box in the cell box_from to the cell box_to.
+        """
+        child = State(self)
+        child.agent_row, child.agent_col = self.level.positions[agent_to]
+        child.parent = self
+        child.action = action
+        child.macro = ()
+        child.g += 1
+        if box_from < 0:
+            if self._hash is not None:
+                agent_keys = self.level.zobrist.agent
+                child._hash = self._hash \
+                    ^ agent_keys[self.agent_row * self.level.MAX_COL + self.agent_col] \
+                    ^ agent_keys[agent_to]
+        else:
+            letter = child._move_box(box_from, box_to)
+            if self._hash is not None:
+                child._hash = self._move_hash(agent_to, letter, box_from, box_to)
+            if self._solved is not None:
+                child._solved = self._move_solved(letter, box_from, box_to)
         return child
 
+    def _move_solved(self, letter: 'str', box_from: 'int', box_to: 'int') -> 'int':
+        """ Solved goals of the child where the box with the given letter moves from box_from to box_to. """
+        goal_letters = self.level.goal_letters
+        solved = self._solved
+        goal = goal_letters[box_from]
+        if goal is not None and goal in letter.lower():
+            solved -= 1
+        goal = goal_letters[box_to]
+        if goal is not None and goal in letter.lower():
+            solved += 1
+        return solved
+
+    def _move_box(self, cell_from: 'int', cell_to: 'int') -> 'str':
+        """ Moves the box in cell_from to cell_to, keeping the cells of each letter sorted. Returns its letter. """
+        cells = self._box_cells
+        letters = self._box_letters
+        index = cells.index(cell_from)
+        letter = letters[index]
+        first = bisect_left(letters, letter)
+        last = bisect_right(letters, letter)
+        if last - first == 1:
+            self._box_cells = cells[:index] + (cell_to,) + cells[index + 1:]
+        else:
+            same_letter = list(cells[first:last])
+            same_letter[index - first] = cell_to
+            same_letter.sort()
+            self._box_cells = cells[:first] + tuple(same_letter) + cells[last:]
+        return letter
+
+    def _move_hash(self, agent_to, letter, box_from, box_to) -> 'int':
+        """
+        Hash of the child where the agent moves to the cell agent_to and the box with the given letter moves from
+        the cell box_from to the cell box_to, computed from the hash of this state.
+        """
+        zobrist = self.level.zobrist
+        agent_keys = zobrist.agent
+        box_keys = zobrist.box(letter)
+        return self._hash \
+            ^ agent_keys[self.agent_row * self.level.MAX_COL + self.agent_col] \
+            ^ agent_keys[agent_to] \
+            ^ box_keys[box_from] \
+            ^ box_keys[box_to]
+
     def get_children(self) -> '[State, ...]':
         """
         Returns a list of child states attained from applying every applicable action in the current state.
-        The order of the actions is random.
+        The order of the actions is random, unless State.SHUFFLE is False.
         """
         children = []
-        for action in ALL_ACTIONS:
-            child = self.get_child(action)
-            if child:
-                children.append(child)
-        State._RANDOM.shuffle(children)
+        cells = self._box_cells
+        # The letters with dead cells are the ones whose boxes must all end on a goal
+        required = self.level.dead_cells(self._box_letters) if State.PRUNE_DEAD or State.DETECT_FREEZE else None
+        dead = required if State.PRUNE_DEAD else None
+        freeze = self.level.freeze if State.DETECT_FREEZE and required else None
+        tunnels = self.level.tunnels
+        walk_macros = State.WALK_MACROS
+        for action, agent_to, box_from, box_to in \
+                self.level.successors[self.agent_row * self.level.MAX_COL + self.agent_col]:
+            action_type = action.action_type
+            if action_type is ActionType.Move:
+                if not walk_macros and agent_to not in cells:
+                    children.append(self._child(action, agent_to))
+                continue
+            elif action_type is ActionType.Push:
+                if box_from not in cells or box_to in cells:
+                    continue
+            elif agent_to in cells or box_from not in cells:
+                continue
+            if dead and self._is_dead(dead, box_from, box_to):
+                continue
+            child = self._child(action, agent_to, box_from, box_to)
+            if freeze is not None and child._is_frozen(freeze, required, box_to):
+                continue
+            if tunnels is not None and tunnels[box_to]:
+                child, box_end = child._through_tunnel(tunnels, box_to)
+                # The macro leaves the box at the end of the tunnel, which needs the same checks
+                if box_end != box_to and (dead and self._is_dead(dead, box_from, box_end) or
+                                          freeze is not None and child._is_frozen(freeze, required, box_end)):
+                    continue
+            children.append(child)
+        reached = None
+        if walk_macros and (self.action is None or self.action.action_type is not ActionType.Move):
+            reached = self._reachable(self.agent_row * self.level.MAX_COL + self.agent_col)
+            children.extend(self._walk_macros(reached))
+        if self.level.planner is not None:
+            children.extend(self._goal_macros(reached))
+        if State.SHUFFLE:
+            State._RANDOM.shuffle(children)
         return children
 
+    def _is_dead(self, dead: 'Dict[str, bytearray]', box_from: 'int', box_to: 'int') -> 'bool':
+        """ Whether the box in the cell box_from would be moved to a dead cell of its letter, counting it if so. """
+        mask = dead.get(self._box_letters[self._box_cells.index(box_from)])
+        if mask is not None and mask[box_to]:
+            State.dead_pruned += 1
+            return True
+        return False
+
+    def _reachable(self, start: 'int') -> 'Dict[int, Tuple[int, Action]]':
+        """ Cells the agent reaches from the cell start without moving a box, to the (previous cell, move). """
+        successors = self.level.successors
+        cells = self._box_cells
+        reached = {start: None}
+        frontier = [start]
+        while frontier:
+            next_frontier = []
+            for cell in frontier:
+                for action, agent_to, _, _ in successors[cell]:
+                    if action.action_type is ActionType.Move and agent_to not in cells and agent_to not in reached:
+                        reached[agent_to] = (cell, action)
+                        next_frontier.append(agent_to)
+            frontier = next_frontier
+        return reached
+
+    @staticmethod
+    def _walk(reached: 'Dict[int, Tuple[int, Action]]', cell: 'int') -> 'Tuple[Action, ...]':
+        walk = []
+        step = reached[cell]
+        while step is not None:
+            cell, action = step
+            walk.append(action)
+            step = reached[cell]
+        walk.reverse()
+        return tuple(walk)
+
+    def _through_tunnel(self, tunnels: 'bytearray', box: 'int') -> 'Tuple[State, int]':
+        """
+        Macro child that keeps moving the box in the cell box, which this state just pushed or pulled into a tunnel,
+        with the same kind of action while it is in the tunnel and there is a single way to go on, and the cell
+        where it leaves the box. This state is returned when there is none.
+        """
+        action_type = self.action.action_type
+        successors = self.level.successors
+        cols = self.level.MAX_COL
+        state = self
+        macro = []
+        while tunnels[box]:
+            cells = state._box_cells
+            moves = [(action, agent_to, box_to)
+                     for action, agent_to, box_from, box_to in successors[state.agent_row * cols + state.agent_col]
+                     if action.action_type is action_type and box_from == box and box_to not in cells
+                     and (action_type is ActionType.Push or agent_to not in cells)]
+            if len(moves) != 1:
+                break
+            action, agent_to, box_to = moves[0]
+            macro.append(state.action)
+            state = state._child(action, agent_to, box, box_to)
+            box = box_to
+        if state is not self:
+            state.parent = self.parent
+            state.macro = tuple(macro)
+        return state, box
+
+    def _walk_macros(self, reached: 'Dict[int, Tuple[int, Action]]') -> 'List[State]':
+        """
+        Macro children that walk the agent along a shortest path, among the reached cells, to every other cell
+        from which it can push or pull a box, with g increased by the length of the walk. A walk ending in a
+        move is never followed by another one, since the single walk between their ends is as short.
+        """
+        successors = self.level.successors
+        cells = self._box_cells
+        start = self.agent_row * self.level.MAX_COL + self.agent_col
+        targets = set()
+        for box in cells:
+            for action, agent_to, _, _ in successors[box]:
+                if action.action_type is ActionType.Move and agent_to != start and agent_to in reached:
+                    targets.add(agent_to)
+        macros = []
+        for target in sorted(targets):
+            if not any(box_from in cells and (box_to not in cells if action.action_type is ActionType.Push
+                                              else agent_to not in cells)
+                       for action, agent_to, box_from, box_to in successors[target]
+                       if action.action_type is not ActionType.Move):
+                continue
+            walk = self._walk(reached, target)
+            child = self._child(walk[-1], target)
+            child.macro = walk[:-1]
+            child.g = self.g + len(walk)
+            macros.append(child)
+        return macros
+
+    def _goal_macros(self, reached: 'Dict[int, Tuple[int, Action]]' = None) -> 'List[State]':
+        """ Macro children that push a box along a free shortest path to the closest free goal of its letter. """
+        level = self.level
+        planner = level.planner
+        cols = level.MAX_COL
+        positions = level.positions
+        successors = level.successors
+        cells = self._box_cells
+        macros = []
+        for box, letter in zip(cells, self._box_letters):
+            letter = letter.lower()
+            goal = level.goal_letters[box]
+            if goal is not None and goal in letter:
+                continue
+            goals = [pos for pos, goal in level.goals.items()
+                     if goal in letter and pos[0] * cols + pos[1] not in cells]
+            if not goals:
+                continue
+            target = planner.closest_cell(positions[box], goals)
+            path = [row * cols + col for row, col in planner.path_cells(positions[box], target)]
+            if len(path) < 2 or any(cell in cells for cell in path[1:]):
+                continue
+
+            if reached is None:
+                reached = self._reachable(self.agent_row * cols + self.agent_col)
+            walk = None
+            for action, agent_to, _, _ in successors[box]:
+                if action.action_type is ActionType.Move and agent_to != path[1] and agent_to in reached:
+                    candidate = self._walk(reached, agent_to)
+                    if walk is None or len(candidate) < len(walk):
+                        walk, agent = candidate, agent_to
+            if walk is None or (not walk and len(path) == 2):
+                continue
+
+            actions = list(walk)
+            for box_from, box_to in zip(path, path[1:]):
+                actions.extend(action for action, agent_to, from_, to in successors[agent]
+                               if action.action_type is ActionType.Push and from_ == box_from and to == box_to)
+                agent = box_from
+            child = self._child(actions[-1], agent, box, path[-1])
+            child.macro = tuple(actions[:-1])
+            child.g = self.g + len(actions)
+            macros.append(child)
+        return macros
+
+    def actions(self) -> 'Tuple[Action, ...]':
+        """ Primitive actions from the parent to this state. """
+        return self.macro + (self.action,)
+
+    def _is_frozen(self, freeze: 'FreezeDetector', required: 'Dict[str, bytearray]', box_to: 'int') -> 'bool':
+        """ Whether the box this state moved to the cell box_to is frozen in a deadlock, counting it if so. """
+        if freeze.deadlocked(self, box_to, required):
+            State.freeze_pruned += 1
+            return True
+        return False
+
+    def key(self) -> 'Tuple[int, Tuple[int, ...], Tuple[str, ...]]':
+        """ Compact and picklable identity of the state: (agent cell id, box cells, box letters). """
+        return self.agent_row * self.level.MAX_COL + self.agent_col, self._box_cells, self._box_letters
+
+    @classmethod
+    def from_key(cls, level: 'LevelContext', key: 'Tuple[int, Tuple[int, ...], Tuple[str, ...]]',
+                 g: 'int' = 0) -> 'State':
+        """ State of the level with the agent and boxes given by key, without parent. """
+        state = cls(level=level)
+        agent_cell, state._box_cells, state._box_letters = key
+        state.agent_row, state.agent_col = level.positions[agent_cell]
+        state.g = g
+        return state
+
+    def reset_hash(self):
+        """ Must be called after modifying the boxes or the agent of a state that may already be hashed. """
+        self._hash = None
+        self._solved = None
+
     def is_initial_state(self) -> 'bool':
         return self.parent is None
 
@@ -147,26 +467,32 @@ class State:
         return True
 
     def is_subgoal_state(self) -> 'bool':
-        for pos in self.goals:
-            goal = self.goals.get(pos)
-            box = self.boxes.get(pos)
-            if goal is not None and (box is None or goal not in box.lower()):
-                return False
-        return True
+        # There is at most a box per cell, so every goal has a matching box when they are all counted as solved.
+        return self.solved_goals == self.level.goal_count
 
     def is_free(self, row: 'int', col: 'int') -> 'bool':
-        return not self.walls[row][col] and self.boxes.get((row, col)) is None
+        return not self.level.walls[row][col] and row * self.level.MAX_COL + col not in self._box_cells
 
     def box_at(self, row: 'int', col: 'int') -> 'bool':
-        return self.boxes.get((row, col)) is not None
+        return row * self.level.MAX_COL + col in self._box_cells
 
     def extract_plan(self) -> '[State, ...]':
-        plan = []
+        nodes = []
         state = self
         while not state.is_initial_state():
-            plan.append(state)
+            nodes.append(state)
             state = state.parent
-        plan.reverse()
+        nodes.reverse()
+
+        plan = []
+        for node in nodes:
+            if node.macro:
+                # The states inside a macro were never generated
+                state = node.parent
+                for action in node.macro:
+                    state = state.get_child(action)
+                    plan.append(state)
+            plan.append(node)
         return plan
 
     def goal_done(self, pos: Tuple[int, int]) -> 'bool':
@@ -181,28 +507,20 @@ class State:
 
     def __hash__(self):
         if self._hash is None:
-            prime = 31
-            _hash = 1
-            _hash = _hash * prime + self.agent_row
-            _hash = _hash * prime + self.agent_col
-            # _hash = _hash * prime + hash(self.action or 0)
-            # _hash = _hash * prime + self.action
-            _hash = _hash * prime + hash(frozenset(self.boxes.items()))
-            # hash(tuple(tuple(row) for row in self.boxes))
-            _hash = _hash * prime + hash(frozenset(self.goals.items()))
-            #  hash(tuple(tuple(row) for row in self.goals))
-            _hash = _hash * prime + hash(tuple(tuple(row) for row in self.walls))
-            self._hash = _hash
+            # Walls and goals belong to the level, so only the agent and the boxes are hashed.
+            self._hash = self.level.zobrist.hash(self.agent_row * self.level.MAX_COL + self.agent_col,
+                                                 self._box_cells, self._box_letters)
         return self._hash
 
     def __eq__(self, other):
         if self is other: return True
         if not isinstance(other, State): return False
+        if self._hash is not None and other._hash is not None and self._hash != other._hash: return False
         if self.agent_row != other.agent_row: return False
         if self.agent_col != other.agent_col: return False
-        if self.boxes != other.boxes: return False
-        if self.goals != other.goals: return False
-        if self.walls != other.walls: return False
+        if self.level is not other.level: return False
+        if self._box_cells != other._box_cells: return False
+        if self._box_letters != other._box_letters: return False
         return True
 
     def __repr__(self):
@@ -217,3 +535,75 @@ class State:
                 else: line.append(' ')
             lines.append(''.join(line))
         return '\n'.join(lines)
+
+
+
+class BoxView(MutableMapping):
+    """
+        Dict-like view {(row, col): letter} of the boxes of a state. Missing cells give None, like the
+        defaultdict the boxes used to be. Modifying the view replaces the boxes of the state.
+    """
+    __slots__ = ('_state',)
+
+    def __init__(self, state: 'State'):
+        self._state = state
+
+    def _cell(self, pos: 'Tuple[int, int]') -> 'int':
+        cols = self._state.level.MAX_COL
+        if not 0 <= pos[1] < cols:
+            return -1
+        return pos[0] * cols + pos[1]
+
+    def get(self, pos: 'Tuple[int, int]', default=None) -> 'str':
+        cells = self._state._box_cells
+        cell = self._cell(pos)
+        if cell in cells:
+            return self._state._box_letters[cells.index(cell)]
+        return default
+
+    def __getitem__(self, pos: 'Tuple[int, int]') -> 'str':
+        return self.get(pos)
+
+    def __contains__(self, pos) -> 'bool':
+        return self._cell(pos) in self._state._box_cells
+
+    def __setitem__(self, pos: 'Tuple[int, int]', letter: 'str'):
+        boxes = self.copy()
+        boxes[pos] = letter
+        self._state.boxes = boxes
+
+    def __delitem__(self, pos: 'Tuple[int, int]'):
+        boxes = self.copy()
+        del boxes[pos]
+        self._state.boxes = boxes
+
+    def pop(self, pos: 'Tuple[int, int]', *default) -> 'str':
+        if default and pos not in self:
+            return default[0]
+        boxes = self.copy()
+        letter = boxes.pop(pos, *default)
+        self._state.boxes = boxes
+        return letter
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> 'int':
+        return len(self._state._box_cells)
+
+    def keys(self) -> 'List[Tuple[int, int]]':
+        positions = self._state.level.positions
+        return [positions[cell] for cell in self._state._box_cells]
+
+    def values(self) -> 'Tuple[str, ...]':
+        return self._state._box_letters
+
+    def items(self) -> 'List[Tuple[Tuple[int, int], str]]':
+        positions = self._state.level.positions
+        return [(positions[cell], letter) for cell, letter in zip(self._state._box_cells, self._state._box_letters)]
+
+    def copy(self) -> 'Dict[Tuple[int, int], str]':
+        return dict(self.items())
+
+    def __repr__(self):
+        return repr(self.copy())
@@ -8,8 +8,8 @@ def box_on_the_way(state: 'State', planner: 'Planner', wall_map: 'WallMap', **ex
     chosen_boxes = set(x for goal, ((x), letter) in goal_box)
     for goal, box in goal_box:
         if not goal_done(state, goal):
-            path = planner.path_cells((state.agent_row, state.agent_col), box[0])
-            path += planner.path_cells(box[0], goal)
+            path = planner.path_set((state.agent_row, state.agent_col), box[0])
+            path |= planner.path_set(box[0], goal)
             for pos in path:
                 if pos != box[0] and pos != goal:
                     b_letter = state.boxes.get(pos)
@@ -5,8 +5,13 @@
 
 from abc import ABCMeta, abstractmethod
 from collections import deque, namedtuple
-from time import perf_counter
-from queue import PriorityQueue as prioque
+from math import inf
+from queue import Empty
+from time import perf_counter, sleep
+from action import ALL_ACTIONS
+import multiprocessing
+import os
+from heapq import heappush, heappop, heapify
 from heuristic import factory as heuristic_factory
 from state import State
 from preprocessing import GoalMap, NodeType, one_freq_letter
@@ -24,6 +29,8 @@ class Strategy(metaclass=ABCMeta):
     def __init__(self):
         self.explored = set()
         self.start_time = perf_counter()
+        self._dead_pruned = State.dead_pruned
+        self._freeze_pruned = State.freeze_pruned
 
     def add_to_explored(self, state: 'State'):
         self.explored.add(state)
@@ -38,12 +45,34 @@ class Strategy(metaclass=ABCMeta):
         return perf_counter() - self.start_time
 
     def search_status(self) -> 'str':
-        return '#Explored: {:4}, #Frontier: {:3}, Time: {:3.2f} s, Alloc: {:4.2f} MB, MaxAlloc: {:4.2f} MB'.format(
+        status = '#Explored: {:4}, #Frontier: {:3}, Time: {:3.2f} s, Alloc: {:4.2f} MB, MaxAlloc: {:4.2f} MB'.format(
             self.explored_count(), self.frontier_count(), self.time_spent(), memory.get_usage(), memory.max_usage)
+        if State.PRUNE_DEAD:
+            status = '{}, #DeadPruned: {}'.format(status, State.dead_pruned - self._dead_pruned)
+        if State.DETECT_FREEZE:
+            status = '{}, #FreezePruned: {}'.format(status, State.freeze_pruned - self._freeze_pruned)
+        cache = self.heuristic_cache()
+        if cache is not None and cache.hits + cache.misses:
+            status = '{}, {}'.format(status, cache.status())
+        return status
+
+    def heuristic_cache(self) -> 'BoxCache':
+        """ Cache of the box-only parts of the heuristic of the strategy, or None. """
+        return getattr(getattr(self, 'heuristic', None), 'cache', None)
 
     def is_goal_state(self, state: 'State'):
         return state.is_subgoal_state()
 
+    def on_memory_exceeded(self) -> 'bool':
+        """
+        Called by the search loop when the memory usage exceeds memory.max_usage. Memory-bounded strategies
+        bound their tables and return True to continue the search; the others return False to stop it.
+        """
+        return False
+
+    def release(self):
+        """ Called once the strategy is done or replaced, to give back what it changed outside of itself. """
+
     @abstractmethod
     def get_and_remove_leaf(self) -> 'State': raise NotImplementedError
 
@@ -120,70 +149,531 @@ class StrategyDFS(Strategy):
 
 
 class StrategyBestFirst(Strategy):
-    def __init__(self, heuristic: 'Heuristic', **kwargs):
+    """
+        Best-first search over a heapq frontier of tuples (f, tie-break key, insertion counter, state).
+        tie_breaking decides between states with the same f:
+            'h': lowest h first, then the last inserted (default).
+            'lifo': the last inserted.
+            'fifo': the first inserted.
+    """
+    def __init__(self, heuristic: 'Heuristic', tie_breaking: 'str' = 'h', **kwargs):
         super().__init__()
+        if tie_breaking not in ('h', 'lifo', 'fifo'):
+            raise ValueError('Unknown tie breaking: {}.'.format(tie_breaking))
         self.heuristic = heuristic
-        self.frontier = prioque()
+        self.tie_breaking = tie_breaking
+        self.frontier = []
         self.frontier_set = set()
+        self._counter = 0
 
     def get_and_remove_leaf(self) -> 'State':
-        leaf = self.frontier.get().data
-        # I have created a PEntry class to know how to compare the tuples (priority, state)
+        leaf = heappop(self.frontier)[-1]
         self.frontier_set.remove(leaf)
         return leaf
 
     def add_to_frontier(self, state: 'State'):
-        # I have created a PEntry class to know how to compare the tuples (priority, state)
-        self.frontier.put(PEntry(self.heuristic.f(state), state))
+        heappush(self.frontier, self._entry(state))
         self.frontier_set.add(state)
 
+    def _entry(self, state: 'State') -> 'Tuple':
+        f, h = self.heuristic.evaluate(state)
+        return (f,) + self._tie(h) + (state,)
+
+    def _tie(self, h: 'int') -> 'Tuple[int, int]':
+        # The counter is unique, so the states themselves are never compared
+        self._counter += 1
+        if self.tie_breaking == 'h':
+            return h, -self._counter
+        elif self.tie_breaking == 'lifo':
+            return 0, -self._counter
+        else:
+            return 0, self._counter
+
     def in_frontier(self, state: 'State') -> 'bool':
         return state in self.frontier_set
 
     def frontier_count(self) -> 'int':
-        return self.frontier.qsize()
+        return len(self.frontier)
 
     def frontier_empty(self) -> 'bool':
-        return self.frontier.empty()
+        return not self.frontier
 
     def __repr__(self):
-        return 'Best-first Search (PriorityQueue) using {}'.format(self.heuristic)
+        return 'Best-first Search (heapq) using {}'.format(self.heuristic)
+
+
+class StrategyBucketBestFirst(Strategy):
+    """
+        Best-first search over a bucket (dial) queue: one deque of states per integer f value and a pointer to
+        the lowest bucket that may be non-empty, so adding and removing a state are O(1). The heuristics must
+        give integer values of f. Within a bucket the states come out LIFO, or FIFO if lifo is False.
+    """
+    def __init__(self, heuristic: 'Heuristic', lifo: 'bool' = True, **kwargs):
+        super().__init__()
+        self.heuristic = heuristic
+        self.lifo = lifo
+        # buckets[i] holds the states with f = base + i
+        self.buckets = []
+        self.base = None
+        self.frontier_set = set()
+        self._min = 0
+        self._count = 0
+
+    def get_and_remove_leaf(self) -> 'State':
+        buckets = self.buckets
+        while not buckets[self._min]:
+            self._min += 1
+        bucket = buckets[self._min]
+        leaf = bucket.pop() if self.lifo else bucket.popleft()
+        self._count -= 1
+        self.frontier_set.remove(leaf)
+        return leaf
+
+    def add_to_frontier(self, state: 'State'):
+        f = self.heuristic.f(state)
+        if self.base is None:
+            self.base = f
+        index = f - self.base
+        if index < 0:
+            # Lower f than any seen so far: grow the buckets at the front
+            self.buckets[:0] = [deque() for _ in range(-index)]
+            self.base = f
+            self._min -= index
+            index = 0
+        buckets = self.buckets
+        while len(buckets) <= index:
+            buckets.append(deque())
+        buckets[index].append(state)
+        if index < self._min:
+            self._min = index
+        self._count += 1
+        self.frontier_set.add(state)
+
+    def in_frontier(self, state: 'State') -> 'bool':
+        return state in self.frontier_set
+
+    def frontier_count(self) -> 'int':
+        return self._count
+
+    def frontier_empty(self) -> 'bool':
+        return self._count == 0
+
+    def __repr__(self):
+        return 'Best-first Search (buckets) using {}'.format(self.heuristic)
 
 
 class StrategyCompBestFirst(StrategyBestFirst):
+    """
+        Best-first search that adds goal_constant for every unsolved goal to f. The composite key is
+        computed once per entry, which is (key, tie-break key, counter, f, unsolved goals, state), and
+        the whole frontier is rebuilt in a single pass when goal_constant changes.
+    """
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.goal_constant = 0
+        self._goal_constant = 0
+
+    @property
+    def goal_constant(self) -> 'int':
+        return self._goal_constant
+
+    @goal_constant.setter
+    def goal_constant(self, goal_constant: 'int'):
+        if goal_constant != self._goal_constant:
+            self._goal_constant = goal_constant
+            self.frontier = [(f + goal_constant * unsolved, tie, counter, f, unsolved, state)
+                             for _, tie, counter, f, unsolved, state in self.frontier]
+            heapify(self.frontier)
+
+    def _entry(self, state: 'State') -> 'Tuple':
+        f, h = self.heuristic.evaluate(state)
+        unsolved = state.total_goals - state.solved_goals
+        return (f + self._goal_constant * unsolved,) + self._tie(h) + (f, unsolved, state)
+
+
+class StrategyIDAStar(Strategy):
+    """
+        Iterative deepening A*, with a transposition table of at most table_size states.
+    """
+
+    def __init__(self, heuristic: 'Heuristic', table_size: 'int' = 1000000, **kwargs):
+        super().__init__()
+        self.heuristic = heuristic
+        self.table_size = table_size
+        self.table = {}
+        self.root = None
+        self.bound = None
+        self.next_bound = inf
+        self.iteration = 0
+        self.stack = []
+        self.stack_g = {}
+        self._expanded = 0
+
+    def get_and_remove_leaf(self) -> 'State':
+        leaf = self.stack.pop()
+        count, g = self.stack_g[leaf]
+        if count == 1:
+            del self.stack_g[leaf]
+        else:
+            self.stack_g[leaf] = (count - 1, g)
+        return leaf
 
     def add_to_frontier(self, state: 'State'):
-        self.frontier.put(AltPEntry(self.heuristic.f(state), state, self))
-        self.frontier_set.add(state)
+        f = self.heuristic.f(state)
+        if self.root is None:
+            self.root = state
+            self.bound = f
+        if f > self.bound:
+            self.next_bound = min(self.next_bound, f)
+        else:
+            self._push(state)
 
+    def _push(self, state: 'State'):
+        # The same state can be on the stack more than once, so the count of its copies and their lowest g are kept
+        count, g = self.stack_g.get(state, (0, inf))
+        self.stack.append(state)
+        self.stack_g[state] = (count + 1, min(g, state.g))
 
-class PEntry(object):
-    def __init__(self, priority, data):
-        self.data = data
-        self.priority = priority
+    def add_to_explored(self, state: 'State'):
+        self._expanded += 1
+        if len(self.table) < self.table_size or state in self.table:
+            self.table[state] = state.g
 
-    def __lt__(self, other):
-        return self.priority < other.priority
+    def is_explored(self, state: 'State') -> 'bool':
+        g = self.table.get(state)
+        if g is not None:
+            return g <= state.g
+        if len(self.table) >= self.table_size:
+            ancestor = state.parent
+            while ancestor is not None:
+                if ancestor == state:
+                    return True
+                ancestor = ancestor.parent
+        return False
 
+    def in_frontier(self, state: 'State') -> 'bool':
+        entry = self.stack_g.get(state)
+        return entry is not None and entry[1] <= state.g
 
-class AltPEntry(PEntry):
+    def frontier_count(self) -> 'int':
+        return len(self.stack)
 
-    def __init__(self, priority, data, strategy):
-        super().__init__(priority, data)
-        self.data = data
-        self.strategy = strategy
+    def frontier_empty(self) -> 'bool':
+        # An exhausted iteration starts the next one, unless no state exceeded the bound
+        if not self.stack and self.next_bound < inf:
+            self.bound = self.next_bound
+            self.next_bound = inf
+            self.iteration += 1
+            self.table.clear()
+            self._push(self.root)
+        return not self.stack
 
-    @property
-    def priority(self):
-        return super().priority + self.strategy.goal_constant * (self.data.total_goals - self.data.solved_goals)
+    def explored_count(self) -> 'int':
+        return self._expanded
 
-    @priority.setter
-    def priority(self, val):
-        super().priority = val
+    def on_memory_exceeded(self) -> 'bool':
+        self.table_size = min(self.table_size, len(self.table))
+        return True
+
+    def __repr__(self):
+        return 'IDA* (bound {}, iteration {}) using {}'.format(self.bound, self.iteration, self.heuristic)
+
+
+class StrategySMAStar(StrategyBestFirst):
+    """
+        Simplified memory-bounded A*: a best-first frontier of at most max_nodes states, or bounded the first time
+        memory.max_usage is exceeded.
+    """
+
+    def __init__(self, heuristic: 'Heuristic', max_nodes: 'int' = None, **kwargs):
+        super().__init__(heuristic, **kwargs)
+        self.max_nodes = max_nodes
+        self.forgotten = 0
+        self._leaf = None
+        self._leaf_f = None
+
+    def get_and_remove_leaf(self) -> 'State':
+        entry = heappop(self.frontier)
+        leaf = entry[-1]
+        self.frontier_set.remove(leaf)
+        self._leaf, self._leaf_f = leaf, entry[0]
+        return leaf
+
+    def add_to_frontier(self, state: 'State'):
+        super().add_to_frontier(state)
+        if self.max_nodes is not None and len(self.frontier) > self.max_nodes:
+            self._forget()
+
+    def _entry(self, state: 'State') -> 'Tuple':
+        f, h = self.heuristic.evaluate(state)
+        if state.parent is not None and state.parent is self._leaf:
+            f = max(f, self._leaf_f)
+        return (f,) + self._tie(h) + (state,)
+
+    def _forget(self):
+        keep = max(1, self.max_nodes * 3 // 4)
+        # A sorted list is a heap
+        self.frontier.sort()
+        forgotten = self.frontier[keep:]
+        del self.frontier[keep:]
+        backed_up = {}
+        for entry in forgotten:
+            state = entry[-1]
+            self.frontier_set.discard(state)
+            parent = state.parent
+            if parent is not None and entry[0] < backed_up.get(parent, inf):
+                backed_up[parent] = entry[0]
+        for parent, f in backed_up.items():
+            self.explored.discard(parent)
+            if parent not in self.frontier_set:
+                # Ties go to the deeper states, or the same children would be generated and forgotten again
+                heappush(self.frontier, (f,) + self._tie(f - parent.g) + (parent,))
+                self.frontier_set.add(parent)
+        self.forgotten += len(forgotten)
+
+    def on_memory_exceeded(self) -> 'bool':
+        if self.max_nodes is None:
+            self.max_nodes = max(1, len(self.frontier))
+        return True
+
+    def search_status(self) -> 'str':
+        return '{}, #Forgotten: {}'.format(super().search_status(), self.forgotten)
+
+    def __repr__(self):
+        return 'SMA* (max nodes {}) using {}'.format(self.max_nodes, self.heuristic)
+
+
+class StrategyHDAStar(Strategy):
+    """
+        Hash-distributed A*: the states are partitioned by hash between worker processes, which exchange the
+        successors in batches of compact keys.
+    """
+    BATCH_SIZE = 64
+
+    def __init__(self, heuristic: 'Heuristic', workers: 'int' = None, **kwargs):
+        super().__init__()
+        self.heuristic = heuristic
+        self.workers = workers or os.cpu_count() or 1
+        self.root = None
+        self.result = None
+        self.searched = False
+        self._expanded = 0
+
+    def get_and_remove_leaf(self) -> 'State':
+        # The goal stays in the frontier, so strategies that wrap this one can notice it more than once
+        if not self.searched:
+            self._search()
+        return self.result
+
+    def add_to_frontier(self, state: 'State'):
+        if self.root is None:
+            self.root = state
+
+    def in_frontier(self, state: 'State') -> 'bool':
+        return state is self.result
+
+    def frontier_count(self) -> 'int':
+        return 0 if self.result is None else 1
+
+    def frontier_empty(self) -> 'bool':
+        if not self.searched:
+            self._search()
+        return self.result is None
+
+    def explored_count(self) -> 'int':
+        return self._expanded
+
+    def _search(self):
+        self.searched = True
+        workers = self.workers
+        context = multiprocessing.get_context('fork')
+        inboxes = [context.Queue() for _ in range(workers)]
+        results = context.Queue()
+        sent = context.RawArray('q', workers)
+        received = context.RawArray('q', workers)
+        expanded = context.RawArray('q', workers)
+        # Lowest f in the open list of each worker, -inf while it is busy
+        open_f = context.RawArray('d', [-inf] * workers)
+        processes = [context.Process(target=_hda_worker,
+                                     args=(index, workers, self.root, self.heuristic, inboxes, results,
+                                           sent, received, expanded, open_f),
+                                     daemon=True)
+                     for index in range(workers)]
+        for process in processes:
+            process.start()
+
+        incumbent, goal_key = inf, None
+        try:
+            while True:
+                try:
+                    message = results.get(timeout=0.01)
+                except Empty:
+                    message = None
+                if message is not None and message[1] < incumbent:
+                    _, incumbent, goal_key = message
+                    for inbox in inboxes:
+                        inbox.put(('bound', incumbent))
+                if self._terminated(sent, received, open_f, incumbent):
+                    break
+                if not all(process.is_alive() for process in processes):
+                    raise RuntimeError('A HDA* worker died.')
+            # Drain the solutions reported while checking the termination
+            while True:
+                try:
+                    _, cost, key = results.get_nowait()
+                except Empty:
+                    break
+                if cost < incumbent:
+                    incumbent, goal_key = cost, key
+            if goal_key is not None:
+                self.result = self._replay(self._plan(goal_key, inboxes, results, processes))
+        finally:
+            self._expanded = sum(expanded)
+            for inbox in inboxes:
+                inbox.put(('stop',))
+            for process in processes:
+                process.join(1)
+                if process.is_alive():
+                    process.terminate()
+
+    @staticmethod
+    def _terminated(sent, received, open_f, incumbent) -> 'bool':
+        def snapshot():
+            return sum(sent), sum(received), all(f >= incumbent for f in open_f)
+
+        first = snapshot()
+        if first[0] != first[1] or not first[2]:
+            return False
+        # The counters are read without locks, so they must be stable over a second snapshot
+        sleep(0.01)
+        return snapshot() == first
+
+    def _plan(self, goal_key, inboxes, results, processes) -> 'List[str]':
+        """
+        Names of the actions from the root to the goal, asking each owner for the parent of its state. The names
+        of the actions of a macro are separated by spaces.
+        """
+        actions = []
+        key = goal_key
+        while True:
+            inboxes[_hda_owner(key, self.workers)].put(('parent', key))
+            message = None
+            while message is None or message[0] != 'parent':
+                try:
+                    message = results.get(timeout=0.01)
+                except Empty:
+                    message = None
+                if not all(process.is_alive() for process in processes):
+                    raise RuntimeError('A HDA* worker died.')
+            _, parent_key, action = message
+            if parent_key is None:
+                break
+            actions.append(action)
+            key = parent_key
+        actions.reverse()
+        return actions
+
+    def _replay(self, actions: 'List[str]') -> 'State':
+        state = self.root
+        for name in ' '.join(actions).split():
+            state = state.get_child(_HDA_ACTIONS[name])
+        return state
+
+    def __repr__(self):
+        return 'HDA* ({} workers) using {}'.format(self.workers, self.heuristic)
+
+
+_HDA_ACTIONS = {repr(action): action for action in ALL_ACTIONS}
+
+
+def _hda_owner(key: 'Tuple', workers: 'int') -> 'int':
+    # The workers are forked, so they share the hash of the keys with the coordinator
+    return hash(key) % workers
+
+
+def _hda_worker(index, workers, root, heuristic, inboxes, results, sent, received, expanded, open_f):
+    level = root.level
+    inbox = inboxes[index]
+    frontier = []
+    best_g = {}
+    parents = {}
+    outboxes = [[] for _ in range(workers)]
+    counter = 0
+    incumbent = inf
+
+    def insert(key, g, parent_key, action):
+        nonlocal counter
+        if g >= best_g.get(key, inf) or g >= incumbent:
+            return
+        best_g[key] = g
+        parents[key] = (parent_key, action)
+        f, h = heuristic.evaluate(State.from_key(level, key, g))
+        counter += 1
+        heappush(frontier, (f, h, -counter, g, key))
+
+    def flush():
+        for owner, batch in enumerate(outboxes):
+            if batch:
+                sent[index] += len(batch)
+                inboxes[owner].put(('states', batch))
+                outboxes[owner] = []
+
+    root_key = root.key()
+    if _hda_owner(root_key, workers) == index:
+        insert(root_key, root.g, None, None)
+
+    while True:
+        # Receive
+        arrived = 0
+        try:
+            message = inbox.get(timeout=0.01) if not frontier else inbox.get_nowait()
+            while True:
+                kind = message[0]
+                if kind == 'states':
+                    for key, g, parent_key, action in message[1]:
+                        insert(key, g, parent_key, action)
+                    arrived += len(message[1])
+                elif kind == 'bound':
+                    incumbent = min(incumbent, message[1])
+                elif kind == 'parent':
+                    results.put(('parent',) + parents[message[1]])
+                elif kind == 'stop':
+                    return
+                message = inbox.get_nowait()
+        except Empty:
+            pass
+
+        # Expand
+        for _ in range(16):
+            if not frontier:
+                break
+            f, _, _, g, key = heappop(frontier)
+            if f >= incumbent:
+                frontier.clear()
+                break
+            if g > best_g[key]:
+                continue
+            state = State.from_key(level, key, g)
+            expanded[index] += 1
+            if state.is_subgoal_state():
+                incumbent = g
+                results.put(('goal', g, key))
+                continue
+            for child in state.get_children():
+                child_key = child.key()
+                owner = _hda_owner(child_key, workers)
+                if owner == index:
+                    insert(child_key, child.g, key, ' '.join(map(repr, child.actions())))
+                else:
+                    outboxes[owner].append((child_key, child.g, key, ' '.join(map(repr, child.actions()))))
+                    if len(outboxes[owner]) >= StrategyHDAStar.BATCH_SIZE:
+                        flush()
+        flush()
+
+        # Publish the open list before acknowledging the received states, so that the coordinator never
+        # sees them as neither in transit nor open
+        open_f[index] = frontier[0][0] if frontier else inf
+        received[index] += arrived
 
 
 class SuperStrategy(Strategy):
@@ -218,11 +708,21 @@ class SuperStrategy(Strategy):
             return 'SuperStrategy using {}'.format(self.strategy)
 
     def add_to_explored(self, state: 'State'):
-        self.strategy.explored.add(state)
+        self.strategy.add_to_explored(state)
         self._explored_len += 1
 
     def is_explored(self, state: 'State') -> 'bool':
-        return state in self.strategy.explored
+        return self.strategy.is_explored(state)
+
+    def on_memory_exceeded(self) -> 'bool':
+        return self.strategy.on_memory_exceeded()
+
+    def heuristic_cache(self) -> 'BoxCache':
+        return None if self.strategy is None else self.strategy.heuristic_cache()
+
+    def release(self):
+        if self.strategy is not None:
+            self.strategy.release()
 
     def explored_count(self) -> 'int':
         return self._explored_len
@@ -268,6 +768,7 @@ class StrategySubGoalSeparation(SuperStrategy):
                         if letter is not None and g_ == letter.lower()[0]:
                             goals.append(g)
                 current_state.goals = self._add_goals_to_current(goals)
+                self.release()
                 self.strategy = _aux_factory(self.name,
                                              current_state,
                                              **self.strategy_attributes)
@@ -294,7 +795,7 @@ class StrategySubGoalSeparation(SuperStrategy):
                     box = state.boxes.get(g_)
                     if box is not None and box[0] == state.goals.get(g_)[0]:
                         goals.append(g_)
-            state = State(state)
+            state = type(state)(state)
             state.goals = self._add_goals_to_current(goals)
             if len(goals) == 1:
                 self.strategy_attributes["norm"] = ''
@@ -355,6 +856,7 @@ class SubgoalsSpecialCasesStrategy(StrategySubGoalSeparation):
             if self.goal_index < self.goal_max_index:
                 goals = self.all_goals[self.goal_index]
                 current_state.goals = self._add_goals_to_current(goals)
+                self.release()
 
                 # Chose which strategy to run according to the conditions
                 for case in self.special_cases:
@@ -362,9 +864,8 @@ class SubgoalsSpecialCasesStrategy(StrategySubGoalSeparation):
                         self.all_goals, self.goal_index, self.goal_max_index = \
                             case.goal_correction(self.all_goals, self.goal_index, self.goal_max_index)
                         goals_corr = self.all_goals[self.goal_index]
-                        for g in goals:
-                            if g not in goals_corr:
-                                current_state.goals.pop(g)
+                        current_state.goals = {pos: letter for pos, letter in current_state.goals.items()
+                                               if pos in goals_corr or pos not in goals}
                         if not one_freq_letter(current_state.goals):
                             self.strategy_attributes["norm"] = 'bg'
                         else:
@@ -419,7 +920,7 @@ class SubgoalsSpecialCasesStrategy(StrategySubGoalSeparation):
         if not self.init:
             self.init = True
             goals = self.all_goals[self.goal_index]
-            state = State(state)
+            state = type(state)(state)
             state.goals = self._add_goals_to_current(goals)
 
             # Chose which strategy to run according to the conditions
@@ -428,9 +929,8 @@ class SubgoalsSpecialCasesStrategy(StrategySubGoalSeparation):
                     self.all_goals, self.goal_index, self.goal_max_index = \
                         case.goal_correction(self.all_goals, self.goal_index, self.goal_max_index)
                     goals_corr = self.all_goals[self.goal_index]
-                    for g in goals:
-                        if g not in goals_corr:
-                            state.goals.pop(g)
+                    state.goals = {pos: letter for pos, letter in state.goals.items()
+                                   if pos in goals_corr or pos not in goals}
                     if not one_freq_letter(state.goals):
                         self.strategy_attributes["norm"] = 'bg'
                     else:
@@ -470,6 +970,9 @@ class RemoveFromPathStrategy(Strategy):
         self.wall_map = kwargs.get("wall_map")
         self.goal_map = kwargs.get("goal_map")
         self.walled_boxes = {}
+        self.unwalled = None
+        # Cells blocked in the planner until the strategy is released
+        self.blocked = None
 
     def add_to_frontier(self, state: 'State'):
         if not self.init:
@@ -507,9 +1010,12 @@ class RemoveFromPathStrategy(Strategy):
                 if "*" in letter:
                     current_state.boxes[pos] = letter[0]
             for b_pos, b_char in self.walled_boxes.items():
-                current_state.walls[b_pos[0]][b_pos[1]] = False
                 current_state.boxes[b_pos] = b_char
+            if self.walled_boxes:
+                current_state.walls = self.unwalled
+            self.release()
             self.walled_boxes = {}
+            current_state.reset_hash()
         return current_state
 
     def in_frontier(self, state: 'State') -> 'bool':
@@ -521,6 +1027,19 @@ class RemoveFromPathStrategy(Strategy):
     def frontier_empty(self) -> 'bool':
         return self.strategy.frontier_empty()
 
+    def on_memory_exceeded(self) -> 'bool':
+        return self.strategy.on_memory_exceeded()
+
+    def heuristic_cache(self) -> 'BoxCache':
+        return None if self.strategy is None else self.strategy.heuristic_cache()
+
+    def release(self):
+        if self.blocked:
+            self.planner.unblock(self.blocked)
+        self.blocked = None
+        if self.strategy is not None:
+            self.strategy.release()
+
     def __repr__(self):
         return "RemoveFromPathStrategy"
 
@@ -547,6 +1066,7 @@ class RemoveFromPathStrategy(Strategy):
         return path_ab, path_gb, box
 
     def _placement_location(self, state, path_ab, path_gb, b_pos):
+        goals = state.goals.copy()
         box_is_marked = set()
         nodes_with_unsolved_goals = set()
         for pos, letter in self.goal_map.goals_pos.items():
@@ -559,7 +1079,7 @@ class RemoveFromPathStrategy(Strategy):
         for pos in path:
             if pos != b_pos:
                 box = state.boxes.get(pos)
-                gl = state.goals.get(pos)
+                gl = goals.get(pos)
                 if box is not None and pos not in box_is_marked and (gl is None or box[0].lower() != gl[0]):
                     box_is_marked.add(pos)
                     first_free = 1
@@ -579,15 +1099,15 @@ class RemoveFromPathStrategy(Strategy):
                             # if node in nodes_with_unsolved_goals and node.type_ == NodeType.Corridor:
                             #     expl_squares.add((i, j))
                             # else:
-                            if (i, j) not in curr_path and state.goals.get((i, j)) is None \
+                            if (i, j) not in curr_path and goals.get((i, j)) is None \
                                     and state.boxes.get((i, j)) is None:
                                 if first_free > 0:
-                                    state.goals[(i, j)] = "#"  # state.boxes.get(pos).lower()
+                                    goals[(i, j)] = "#"  # state.boxes.get(pos).lower()
                                     curr_frontier.append((i, j))
                                     empty_space = (i, j)
                                     first_free -= 1
                                 else:
-                                    state.goals[(i, j)] = "*"  # state.boxes.get(pos).lower()
+                                    goals[(i, j)] = "*"  # state.boxes.get(pos).lower()
                                     frontier = []  # Stop exterior loop
                                 break  # Break current loop
                             else:
@@ -603,13 +1123,21 @@ class RemoveFromPathStrategy(Strategy):
                                 expl_squares.add((i, j))
                             frontier = curr_frontier
                     if empty_space is not None:
-                        state.goals.pop(empty_space)
+                        goals.pop(empty_space)
+        state.goals = goals
+        walls = [row[:] for row in state.walls]
         for pos, b_char in state.boxes.items():
             if "*" not in b_char and pos != b_pos and not goal_done(state, pos):
                 self.walled_boxes[pos] = b_char
-                state.walls[pos[0]][pos[1]] = True
+                walls[pos[0]][pos[1]] = True
         for box in self.walled_boxes.keys():
             state.boxes.pop(box)
+        self.unwalled = state.walls
+        state.walls = walls
+        # The heuristics of the sub-strategy measure the distances around the walled boxes
+        self.blocked = list(self.walled_boxes)
+        self.planner.block(self.blocked)
+        state.reset_hash()
 
     class StarPriority:
 
@@ -644,12 +1172,20 @@ def factory(name, initial_state: 'State', subgoals=False, **kwargs) -> 'Strategy
         return _aux_factory(name, initial_state, **kwargs)
 
 
-def _aux_factory(name, initial_state, **kwargs) -> 'Strategy':
+def _aux_factory(name, initial_state, frontier='heap', **kwargs) -> 'Strategy':
     if name == "bfs":
         return StrategyBFS()
     elif name == "dfs":
         return StrategyDFS()
     elif name == "rmv":
-        return RemoveFromPathStrategy("astar", **kwargs)
+        return RemoveFromPathStrategy("astar", frontier=frontier, **kwargs)
+    elif name == "idastar":
+        return StrategyIDAStar(heuristic_factory("astar", initial_state, **kwargs), **kwargs)
+    elif name == "smastar":
+        return StrategySMAStar(heuristic_factory("astar", initial_state, **kwargs), **kwargs)
+    elif name == "hdastar":
+        return StrategyHDAStar(heuristic_factory("astar", initial_state, **kwargs), **kwargs)
+    elif frontier == "bucket":
+        return StrategyBucketBestFirst(heuristic_factory(name, initial_state, **kwargs), **kwargs)
     else:
         return StrategyBestFirst(heuristic_factory(name, initial_state, **kwargs), **kwargs)
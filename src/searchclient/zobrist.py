@@ -0,0 +1,37 @@
+"""
+    Zobrist keys used to hash the states of a level incrementally.
+"""
+import random
+from typing import Tuple
+
+
+class ZobristTable:
+    """
+        Random keys per (cell, box letter) and per agent cell. The hash of a state is the
+        XOR of the keys of the occupied cells, so a child can be hashed in O(1) from its parent.
+    """
+
+    def __init__(self, rows: 'int', cols: 'int', seed: 'int' = 2):
+        self.rows = rows
+        self.cols = cols
+        self._random = random.Random(seed)
+        self.agent = self._new_keys()
+        self._boxes = {}
+
+    def _new_keys(self) -> 'list':
+        return [self._random.getrandbits(64) for _ in range(self.rows * self.cols)]
+
+    def box(self, letter: 'str') -> 'list':
+        """ Keys of the given box letter, created the first time the letter is seen. """
+        keys = self._boxes.get(letter)
+        if keys is None:
+            keys = self._new_keys()
+            self._boxes[letter] = keys
+        return keys
+
+    def hash(self, agent_cell: 'int', box_cells: 'Tuple[int, ...]', box_letters: 'Tuple[str, ...]') -> 'int':
+        """ Full hash of a configuration, only needed when the parent hash is unknown. """
+        _hash = self.agent[agent_cell]
+        for cell, letter in zip(box_cells, box_letters):
+            _hash ^= self.box(letter)[cell]
+        return _hash
@@ -0,0 +1,80 @@
+import random
+import unittest
+import numpy as np
+from action import ActionType
+from heuristic import factory
+from heuristic.batch import BatchAssignment
+from heuristic.h_funct import h_constant_reward
+from state import State
+from preprocessing.planner import Planner
+from test.helpertest import HelperTestCase
+
+
+class BatchAssignmentTestCase(HelperTestCase):
+
+    def heuristics(self, state, **kwargs):
+        """ The heuristic with the array evaluation, and the same one with the loops. """
+        planner = Planner()
+        planner.all_pairs(state.walls)
+        batch = factory('astar', state, heuristic_function=h_constant_reward, dist_function=planner.dist,
+                        planner=planner, h_cache_size=0, **kwargs)
+        loops = factory('astar', state, heuristic_function=h_constant_reward, dist_function=planner.dist,
+                        planner=planner, h_cache_size=0, **kwargs)
+        loops.batch = None
+        return batch, loops
+
+    def testSameValues(self):
+        """
+        The array evaluation gives the values of the loops over the children of a random walk, for every norm
+        """
+        rand = random.Random(5)
+        for map_ in ('levels/SAsorting.lvl', 'levels/SAsoko3_12.lvl'):
+            state = self.initSingleAgentState(map_)
+            self.assertGreaterEqual(len(state.boxes), BatchAssignment.MIN_BOXES)
+            for norm in ('', 'bb', 'bg'):
+                batch, loops = self.heuristics(state, norm=norm)
+                self.assertIsNotNone(batch.batch)
+                current = state
+                for _ in range(100):
+                    children = current.get_children()
+                    for child in children:
+                        self.assertEqual(loops.h(child), batch.h(child), (map_, norm))
+                    moving = [child for child in children if child.action.action_type is not ActionType.Move]
+                    current = rand.choice(moving or children)
+
+    def testDerive(self):
+        """
+        The components derived from the parent after one box moves, also past boxes of its letter, are the ones
+        computed from scratch
+        """
+        rand = random.Random(11)
+        for map_ in ('levels/SAsoko3_12.lvl', 'levels/SAsorting.lvl'):
+            parent = self.initSingleAgentState(map_)
+            engine = self.heuristics(parent)[0].batch
+            limit = parent.MAX_ROW * parent.MAX_COL
+            free = [(row, col) for row in range(parent.MAX_ROW) for col in range(parent.MAX_COL)
+                    if not parent.walls[row][col] and (row, col) not in parent.boxes
+                    and (row, col) != (parent.agent_row, parent.agent_col)]
+            shifted = 0
+            for _ in range(50):
+                box = rand.choice(list(parent.boxes.keys()))
+                boxes = parent.boxes.copy()
+                boxes[rand.choice(free)] = boxes.pop(box)
+                child = State(parent)
+                child.parent = parent
+                child.boxes = boxes
+                _, cells, letters = child.key()
+                shifted += parent.key()[1].index(box[0] * parent.MAX_COL + box[1]) != \
+                    cells.index(next(cell for cell in cells if cell not in parent.key()[1]))
+
+                engine._masks(child, letters)
+                derived = engine._derive(child, cells, letters, limit)
+                fresh = engine._entry(cells, engine._assign(cells, limit, ''))
+                self.assertIsNotNone(derived)
+                for derived_part, fresh_part in zip(derived[2:], fresh[2:]):
+                    self.assertTrue(np.array_equal(derived_part, fresh_part), map_)
+            self.assertGreater(shifted, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import random
+import unittest
+from itertools import groupby
+from action import ActionType
+from state import State
+from test.helpertest import HelperTestCase
+
+
+class BoxViewTestCase(HelperTestCase):
+
+    def assertSortedByLetter(self, state):
+        self.assertEqual(list(state._box_letters), sorted(state._box_letters))
+        for _, group in groupby(zip(state._box_letters, state._box_cells), key=lambda box: box[0]):
+            cells = [cell for _, cell in group]
+            self.assertEqual(cells, sorted(cells))
+
+    def testDictInterface(self):
+        """
+        Setting, popping and deleting boxes through the view, as RemoveFromPathStrategy and trim_map do
+        """
+        state = self.initSingleAgentState('levels/SAsorting.lvl')
+        boxes = state.boxes.copy()
+        self.assertEqual(boxes, dict(state.boxes.items()))
+        self.assertEqual(len(boxes), len(state.boxes))
+        self.assertEqual('T', state.boxes[(1, 1)])
+        self.assertIsNone(state.boxes[(2, 1)])
+        self.assertNotIn((2, 1), state.boxes)
+
+        state.boxes[(1, 1)] = 'T*'
+        boxes[(1, 1)] = 'T*'
+        self.assertEqual(boxes, state.boxes.copy())
+        self.assertEqual('E', state.boxes.pop((1, 3)))
+        self.assertIsNone(state.boxes.pop((2, 1), None))
+        del state.boxes[(1, 5)]
+        del boxes[(1, 3)], boxes[(1, 5)]
+        state.boxes[(2, 1)] = 'E'
+        boxes[(2, 1)] = 'E'
+        self.assertEqual(boxes, state.boxes.copy())
+        self.assertSortedByLetter(state)
+
+        copy = State(state)
+        copy.boxes = state.boxes.copy()
+        self.assertEqual(state, copy)
+        self.assertEqual(hash(state), hash(copy))
+
+    def testMovesKeepOrder(self):
+        """
+        The cells of the boxes stay sorted within each letter along a random walk of pushes and pulls
+        """
+        rand = random.Random(3)
+        state = self.initSingleAgentState('levels/SAsorting.lvl')
+        for _ in range(300):
+            children = state.get_children()
+            moving = [child for child in children if child.action.action_type is not ActionType.Move]
+            state = rand.choice(moving or children)
+            self.assertSortedByLetter(state)
+            rebuilt = State(state)
+            rebuilt.boxes = state.boxes.copy()
+            self.assertEqual(state._box_cells, rebuilt._box_cells)
+            self.assertEqual(state._box_letters, rebuilt._box_letters)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from level import LevelContext
+
+
+def make_level(rows, goals):
+    walls = [[char == '+' for char in row] for row in rows]
+    return LevelContext(walls, goals)
+
+
+class DeadCellsTestCase(unittest.TestCase):
+    # Two rooms without a door between them, the goal of A is in the left one
+    ROWS = ['+++++++',
+            '+  +  +',
+            '+  +  +',
+            '+++++++']
+
+    def testDeadRoom(self):
+        """
+        The cells of the room without the goal are dead, the others and the walls are not
+        """
+        level = make_level(self.ROWS, {(2, 2): 'a'})
+        dead = level.dead_cells(('A',))
+        self.assertEqual(['A'], list(dead))
+        dead_positions = {level.positions[cell] for cell, is_dead in enumerate(dead['A']) if is_dead}
+        self.assertEqual({(1, 4), (1, 5), (2, 4), (2, 5)}, dead_positions)
+
+    def testLettersWithoutMask(self):
+        """
+        The letters whose boxes need not all end on a goal get no mask
+        """
+        level = make_level(self.ROWS, {(2, 2): 'a'})
+        self.assertEqual({}, level.dead_cells(('A', 'A')))
+        self.assertEqual({}, level.dead_cells(('B',)))
+        self.assertEqual(['A'], list(level.dead_cells(('A', 'B'))))
+
+    def testPocket(self):
+        """
+        A box in a cell with a single free neighbour still leaves it when that neighbour has another one
+        """
+        level = make_level(['+++++',
+                            '+  ++',
+                            '++ ++',
+                            '++ ++',
+                            '+++++'], {(1, 1): 'a'})
+        self.assertFalse(any(level.dead_cells(('A',))['A']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from level import LevelContext
+from state import State
+
+
+def make_state(rows, goals):
+    """ State of a level drawn with walls '+', the agent '0' and boxes in capital letters. """
+    walls = [[char == '+' for char in row] for row in rows]
+    state = State(level=LevelContext(walls, goals))
+    boxes = {}
+    for row, line in enumerate(rows):
+        for col, char in enumerate(line):
+            if char == '0':
+                state.agent_row, state.agent_col = row, col
+            elif char.isupper():
+                boxes[(row, col)] = char
+    state.boxes = boxes
+    return state
+
+
+class FreezeDetectorTestCase(unittest.TestCase):
+    # A 2x2 block of boxes closed in by walls, with the agent in the only free cell next to it
+    BLOCK = ['+++++++++',
+             '+AA++  ++',
+             '+AA0+  ++',
+             '+++++++++']
+
+    def deadlocked(self, state, pos):
+        level = state.level
+        required = level.dead_cells(state._box_letters)
+        return level.freeze.deadlocked(state, pos[0] * level.MAX_COL + pos[1], required)
+
+    def testBlockOffGoals(self):
+        """
+        The block can never move again and its boxes are off their goals
+        """
+        state = make_state(self.BLOCK, {(1, 5): 'a', (1, 6): 'a', (2, 5): 'a', (2, 6): 'a'})
+        self.assertTrue(self.deadlocked(state, (2, 2)))
+        self.assertTrue(self.deadlocked(state, (1, 1)))
+
+    def testBlockOnGoals(self):
+        """
+        The same block is frozen on its goals, which is no deadlock
+        """
+        state = make_state(self.BLOCK, {(1, 1): 'a', (1, 2): 'a', (2, 1): 'a', (2, 2): 'a'})
+        self.assertFalse(self.deadlocked(state, (2, 2)))
+
+    def testPullFromCorner(self):
+        """
+        A box in a corner cannot be pushed out, but the agent can pull it
+        """
+        state = make_state(['++++++',
+                            '+A0  +',
+                            '+    +',
+                            '+   a+',
+                            '++++++'], {(3, 4): 'a'})
+        self.assertFalse(self.deadlocked(state, (1, 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
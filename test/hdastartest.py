@@ -0,0 +1,47 @@
+import multiprocessing
+import unittest
+from preprocessing.planner import Planner
+from strategy import factory
+from heuristic.h_funct import h_constant_reward
+from test.helpertest import HelperTestCase
+
+
+class HDAStarTestCase(HelperTestCase):
+
+    def strategy(self, state, workers):
+        planner = Planner()
+        planner.all_pairs(state.walls)
+        return factory(name='hdastar', initial_state=state, planner=planner, heuristic_function=h_constant_reward,
+                       dist_function=planner.dist, workers=workers)
+
+    def testSolve(self):
+        """
+        The workers find a goal, and the plan asked to the owners of its ancestors leads to it from the root
+        """
+        state = self.initSingleAgentState('levels/SAsoko3_12.lvl')
+        strategy = self.strategy(state, 3)
+        strategy.add_to_frontier(state)
+        self.assertFalse(strategy.frontier_empty())
+        goal = strategy.get_and_remove_leaf()
+        self.assertTrue(goal.is_subgoal_state())
+        while goal.parent is not None:
+            goal = goal.parent
+        self.assertIs(state, goal)
+
+    def testPlanDeadWorker(self):
+        """
+        Asking a parent to a dead worker raises instead of waiting forever
+        """
+        state = self.initSingleAgentState('levels/SAsoko3_12.lvl')
+        strategy = self.strategy(state, 1)
+        strategy.add_to_frontier(state)
+        context = multiprocessing.get_context('fork')
+        process = context.Process(target=int)
+        process.start()
+        process.join()
+        with self.assertRaises(RuntimeError):
+            strategy._plan(state.key(), [context.Queue()], context.Queue(), [process])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from clients.searchclient import MultiAgentSearchClient
+from clients.searchclient import MultiAgentSearchClient, SearchClient
 from agent import StatespaceSearchAgent
 from clients.main import is_multi_agent
 class HelperTestCase(unittest.TestCase):
@@ -27,3 +27,10 @@ class HelperTestCase(unittest.TestCase):
             else:
                 raise NotImplementedError()
 
+    def initSingleAgentState(self, map_):
+        """
+        Initial state of a single agent level
+        """
+        with open(map_, 'r') as file:
+            is_multi, first_line = is_multi_agent(file)
+            return SearchClient(file, first_line, False).initial_state
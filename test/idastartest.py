@@ -0,0 +1,39 @@
+import unittest
+from state import State
+from strategy.strategy import StrategyIDAStar
+from test.helpertest import HelperTestCase
+
+
+class ZeroHeuristic:
+    """ Keeps every state within the bound of the root. """
+
+    def f(self, state):
+        return 0
+
+
+class IDAStarTestCase(HelperTestCase):
+
+    def copy(self, state, g):
+        copy = State(state)
+        copy.g = g
+        return copy
+
+    def testStackCopies(self):
+        """
+        A state pushed twice stays in the frontier until both copies are popped, with the lowest of their g
+        """
+        state = self.initSingleAgentState('levels/SAsorting.lvl')
+        strategy = StrategyIDAStar(ZeroHeuristic())
+        strategy.add_to_frontier(self.copy(state, 3))
+        strategy.add_to_frontier(self.copy(state, 5))
+        self.assertTrue(strategy.in_frontier(self.copy(state, 3)))
+        self.assertFalse(strategy.in_frontier(self.copy(state, 2)))
+        self.assertEqual(5, strategy.get_and_remove_leaf().g)
+        self.assertTrue(strategy.in_frontier(self.copy(state, 3)))
+        self.assertEqual(3, strategy.get_and_remove_leaf().g)
+        self.assertFalse(strategy.in_frontier(self.copy(state, 3)))
+        self.assertEqual({}, strategy.stack_g)
+
+
+if __name__ == '__main__':
+    unittest.main()
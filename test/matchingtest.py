@@ -0,0 +1,57 @@
+import random
+import unittest
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from heuristic.matching import MatchingAssignment
+from preprocessing.planner import Planner
+from state import State
+from test.helpertest import HelperTestCase
+
+
+class MatchingTestCase(HelperTestCase):
+
+    def testIncrementalUpdates(self):
+        """
+        After every single box move, the matching repaired from the one of the parent has the cost that
+        linear_sum_assignment finds from scratch, and its potentials stay feasible and tight
+        """
+        rand = random.Random(13)
+        for map_ in ('levels/SAsoko3_12.lvl', 'levels/SAsorting.lvl'):
+            state = self.initSingleAgentState(map_)
+            planner = Planner()
+            planner.all_pairs(state.walls)
+            goals_list = list(state.goals.keys())
+            matching = MatchingAssignment(planner, goals_list, state.MAX_COL)
+            free = [(row, col) for row in range(state.MAX_ROW) for col in range(state.MAX_COL)
+                    if not state.walls[row][col]]
+            matching.value(state)
+            for _ in range(100):
+                boxes = state.boxes.copy()
+                box = rand.choice(list(boxes.keys()))
+                boxes[rand.choice([pos for pos in free if pos not in boxes])] = boxes.pop(box)
+                child = State(state)
+                child.parent = state
+                child.boxes = boxes
+                value = matching.value(child)
+
+                _, cells, letters = child.key()
+                costs = matching._costs(np.array(cells, dtype=np.int64), matching._compatible(child, letters))
+                rows, cols = linear_sum_assignment(costs)
+                self.assertEqual(int(costs[rows, cols].sum()), value, map_)
+
+                # The columns of a repaired matching keep the order of the boxes of the first one
+                entry = matching.matchings[(cells, letters)]
+                self.assertEqual(sorted(cells), sorted(entry.cells.tolist()))
+                square = np.zeros((len(cells), len(cells)), dtype=np.int64)
+                square[:len(costs)] = matching._costs(entry.cells, entry.compatible)
+                reduced = square - entry.u[:, None] - entry.v[None, :]
+                self.assertGreaterEqual(int(reduced.min()), 0)
+                self.assertTrue(np.all(reduced[np.arange(len(cells)), entry.col4row] == 0))
+                self.assertTrue(np.array_equal(entry.row4col[entry.col4row], np.arange(len(cells))))
+                state = child
+            self.assertEqual(1, matching.solved)
+            self.assertGreater(matching.updated, 90)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from preprocessing.planner import Planner
+
+# Two loops around the pillars, and a free cell closed in by walls
+ROWS = ['+++++++++',
+        '+       +',
+        '+ ++ ++ +',
+        '+       +',
+        '++++++ ++',
+        '+ +     +',
+        '+++++++++']
+
+
+def make_walls(rows, blocked=()):
+    walls = [[char == '+' for char in row] for row in rows]
+    for row, col in blocked:
+        walls[row][col] = True
+    return walls
+
+
+def free_cells(walls):
+    return [(row, col) for row in range(len(walls)) for col in range(len(walls[0])) if not walls[row][col]]
+
+
+def bfs(walls, start):
+    """ Distances from start to the free cells it reaches. """
+    dist = {start: 0}
+    frontier = [start]
+    while frontier:
+        next_frontier = []
+        for row, col in frontier:
+            for neighbour in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                if neighbour not in dist and not walls[neighbour[0]][neighbour[1]]:
+                    dist[neighbour] = dist[(row, col)] + 1
+                    next_frontier.append(neighbour)
+        frontier = next_frontier
+    return dist
+
+
+def floyd_warshall(walls):
+    """ Distances between every pair of free cells, as the former dense Floyd-Warshall computed them. """
+    cells = free_cells(walls)
+    inf = float('inf')
+    dist = {(a, b): 0 if a == b else 1 if abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1 else inf
+            for a in cells for b in cells}
+    for k in cells:
+        for a in cells:
+            for b in cells:
+                if dist[(a, k)] + dist[(k, b)] < dist[(a, b)]:
+                    dist[(a, b)] = dist[(a, k)] + dist[(k, b)]
+    return dist
+
+
+class PlannerTestCase(unittest.TestCase):
+
+    def assertDistancesMatch(self, planner, walls):
+        cells = free_cells(walls)
+        for start in cells:
+            reached = bfs(walls, start)
+            for end in cells:
+                self.assertEqual(reached.get(end, Planner.UNREACHABLE), planner.dist(start, end), (start, end))
+
+    def testAllPairs(self):
+        """
+        The search per cell gives the distances of Floyd-Warshall, and UNREACHABLE between disconnected cells
+        """
+        walls = make_walls(ROWS)
+        expected = floyd_warshall(walls)
+        for lazy in (False, True):
+            planner = Planner(lazy=lazy)
+            planner.all_pairs(walls)
+            for (start, end), dist in expected.items():
+                self.assertEqual(Planner.UNREACHABLE if dist == float('inf') else dist, planner.dist(start, end))
+        self.assertEqual(Planner.UNREACHABLE, planner.dist((5, 1), (1, 1)))
+
+    def testPathCells(self):
+        """
+        path_cells goes from one cell to the other in dist + 1 cells, each one next to the previous one, and is
+        empty between disconnected cells
+        """
+        walls = make_walls(ROWS)
+        planner = Planner()
+        planner.all_pairs(walls)
+        cells = free_cells(walls)
+        for start in cells:
+            for end in cells:
+                path = planner.path_cells(start, end)
+                dist = planner.dist(start, end)
+                if dist == Planner.UNREACHABLE:
+                    self.assertEqual([], path)
+                    continue
+                self.assertEqual(dist + 1, len(path))
+                self.assertEqual((start, end), (path[0], path[-1]))
+                for (row, col), (next_row, next_col) in zip(path, path[1:]):
+                    self.assertEqual(1, abs(row - next_row) + abs(col - next_col))
+                self.assertEqual(set(path), planner.path_set(start, end))
+
+    def testBlockUnblock(self):
+        """
+        Blocking gives the distances of the layout with the blocked cells as walls, unblocking gives back the
+        matrix of all_pairs
+        """
+        walls = make_walls(ROWS)
+        blocked = [(1, 4), (3, 3)]
+        for lazy in (False, True):
+            planner = Planner(lazy=lazy)
+            planner.all_pairs(walls)
+            if not lazy:
+                original = np.array(planner.mat)
+            self.assertDistancesMatch(planner, walls)
+            planner.block(blocked)
+            self.assertDistancesMatch(planner, make_walls(ROWS, blocked))
+            planner.unblock(blocked)
+            self.assertDistancesMatch(planner, walls)
+            if not lazy:
+                self.assertTrue(np.array_equal(original, planner.mat))
+
+    def testBlockCachedMatrix(self):
+        """
+        Blocking the matrix loaded from the cache directory does not modify the cached file
+        """
+        walls = make_walls(ROWS)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            original = np.array(Planner(cache_dir=cache_dir).all_pairs(walls))
+            planner = Planner(cache_dir=cache_dir)
+            self.assertTrue(isinstance(planner.all_pairs(walls), np.memmap))
+            planner.block([(1, 4)])
+            self.assertDistancesMatch(planner, make_walls(ROWS, [(1, 4)]))
+            cached, = os.listdir(cache_dir)
+            self.assertTrue(np.array_equal(original, np.load(os.path.join(cache_dir, cached))))
+            planner.unblock([(1, 4)])
+            self.assertTrue(np.array_equal(original, planner.mat))
+
+
+if __name__ == '__main__':
+    unittest.main()
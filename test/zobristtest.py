@@ -0,0 +1,32 @@
+import random
+import unittest
+from action import ActionType
+from test.helpertest import HelperTestCase
+
+
+class ZobristTestCase(HelperTestCase):
+
+    def testIncrementalHash(self):
+        """
+        The hash of every child, derived from the one of its parent, is the hash computed from scratch, along a
+        random walk that prefers the pushes and pulls
+        """
+        rand = random.Random(7)
+        for map_ in ('levels/SAsorting.lvl', 'levels/SACrunch.lvl'):
+            state = self.initSingleAgentState(map_)
+            hash(state)
+            box_moves = 0
+            for _ in range(300):
+                children = state.get_children()
+                for child in children:
+                    incremental = hash(child)
+                    child.reset_hash()
+                    self.assertEqual(hash(child), incremental)
+                moving = [child for child in children if child.action.action_type is not ActionType.Move]
+                state = rand.choice(moving or children)
+                box_moves += bool(moving)
+            self.assertGreater(box_moves, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()